@@ -1,231 +1,938 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
-from openai import OpenAI
-from agents import Agent, Runner, trace, function_tool
+
+# Before the modules below read their settings from the environment.
+load_dotenv(override=True)
+
+from adaptive import (ADAPTIVE_MAX_QUESTIONS, ADAPTIVE_TARGET_SE, covered_tags, estimate_ability, expected_score,
+                      item_difficulty, next_question, stop_reason)
+from artifacts import AgentRunContext, ArtifactStore
+from deadlines import DEADLINE_HEADER, current_deadline, deadline_bounded, request_deadline, within_deadline
+from engines import (DEFAULT_QUESTION_COUNT, EVALUATION_CHUNK_SIZE, InterviewEvaluator, InterviewQuestionPreparer,
+                     engine_warm_up, model_scheduler, token_stats)
+from evaluation_cache import (INCREMENTAL_MAX_CHANGED_RATIO, EvaluationCache, changed_questions, evaluation_key,
+                              extract_verdicts, lineage_key, merge_report, narrative_key)
+from batch import BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY, build_answer_sheet, summarize_batch
+from grading import (ANSWER_KEY_FIELDS, drop_mismatched_keys, graded_report, grade, has_answer_key, performance_rank,
+                     public_question, public_question_set, question_id, question_set_id)
+from jobs import FINISHED_STATES, JobStore, JobWorkerPool
+from metrics import current_endpoint, metrics
+from prewarm import PrewarmPool
+from question_bank import QuestionBank
+from question_cache import QuestionSetCache
+from registry import BackgroundLoop
+from sessions import SessionStore
+from scheduler import SingleFlight, coalesced, current_priority
+from sharding import default_shard_count
+from similarity import NearDuplicateFilter, SimilarityIndex
+from streaming import sse_event
+from tracing import trace_sink
+from wire import FastJSONProvider, answer_ids, parse_interview_json, rehydrate_answers
 import asyncio
 import json
 import os
+import time
+import uuid
 
 app = Flask(__name__)
 
+# Request bodies and responses go through orjson when it is installed.
+app.json = FastJSONProvider(app)
+
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-load_dotenv(override=True)
+MAX_QUESTION_COUNT = 200
 
-class InterviewQuestionPreparer:
-    def __init__(self, jobdesc, criteria):
-        self.jobdesc = jobdesc
-        self.criteria = criteria
-
-    def create_interviewer_system_prompt(self):
-        """Creates a system prompt for the interviewer agent."""
-        return f"""You are a technical guru working for Cognizant Technology Solutions pvt Limited.
-        Your job is to prepare questions to interview prospective cadidates on their technical skills based on given job description {self.jobdesc}.
-        You must prepare questions based on the criteria {self.criteria}.
-        Make sure to prepare scenario based questions with multiple options for the candidate to choose from. All the questions must have multiple options to choose from.
-        There should be at least 5 options for each question.
-        Some of the questions may have multiple correct answers.
-        The questions should be designed to assess the candidate's problem-solving abilities and technical knowledge.
-        The questions should be relevant to the job description and criteria provided.
-        The questions should be challenging and should require the candidate to demonstrate their understanding of the concepts.
-        The questions should be scenario-based, allowing candidates to apply their knowledge in practical situations.
-        The questions should be designed to evaluate the candidate's ability to think critically and solve problems effectively.
-        The questions should be designed to assess the candidate's experience and expertise in the relevant technologies and methodologies.
-        The questions should be designed to assess the candidate's technical skills and knowledge relevant to the job role.
-        The questions should be varied in difficulty to ensure a comprehensive assessment of the candidate's abilities.
-        The questions should be designed to encourage candidates to explain their thought process and reasoning.
-        The questions should be designed to assess the candidate's ability to work under pressure and make decisions quickly.
-        The questions should be designed to assess the candidate's ability to communicate technical concepts effectively.
-        The questions should be designed to assess the candidate's ability to adapt to new technologies and methodologies.
-        The questions should be designed to assess the candidate's understanding of best practices in software development and engineering.
-        The questions should be designed to assess the candidate's familiarity with industry standards and practices.
-        The questions should be challenging and relevant to the job role and experience level.
-        The questions should be clear and concise, avoiding any ambiguity.
-        You must create 25 questions based on the above criteria and job description which can be answered in 30 minutes by an expert candidate.
-        You must return a json object with the following structure:
-        {{
-            "questions": [
-                {{
-                    "question": "Question text here",
-                    "options": [
-                        "Option 1",
-                        "Option 2",
-                        "Option 3",
-                        "Option 4",
-                        "Option 5"
-                    ]
-                }},
-                # Add more questions here
-            ]
-        }}
-        Return only the json object without any additional text or explanation.
-        """
-    
-    @function_tool
-    def get_json(content: str, filename: str = "questions.json") -> dict:
-        try:
-            # Step 1: Remove escaped newlines
-            clean_string = content.encode('utf-8').decode('unicode_escape')
+question_cache = QuestionSetCache()
 
-            # Step 2: Convert to dictionary
-            data = json.loads(clean_string)
-            with open(filename, "w") as file:
-                    file.write(clean_string)       
-        except Exception as e:
-            print(f"An error occurred while writing to the file: {e}")
-
-    async def execute_agent(self, message):
-        """Executes the agent to prepare interview questions."""
-        evaluator_agent = Agent(
-            name='Question Setter Agent',
-            instructions=self.create_interviewer_system_prompt(),
-            model='gpt-4o-mini',
-            tools=[self.get_json])
-                        
-        with trace('Automated Technical Evaluation'):
-            result = await Runner.run(evaluator_agent, message)
-        return result    
-
-class InterviewEvaluator:
-    def __init__(self, jobdesc, criteria, interview_json):
-        self.jobdesc = jobdesc
-        self.criteria = criteria
-        self.interview_json = interview_json
-
-    def get_evaluator_prompt(self):
-        """Creates a system prompt for the evaluator agent."""
-        return f"""You are a technical interview evaluator. 
-                Your job is to evaluate the candidate's answers based on the job description {self.jobdesc} and criteria {self.criteria}.
-                You will be given a json string containing questions and answers of a candidate.
-                The json string will have the following structure:
-                {{
-                    "questions": [
-                        {{
-                            "question": "Question text here",
-                            "options": [
-                                "Option 1",
-                                "Option 2",
-                                "Option 3",
-                                "Option 4",
-                                "Option 5"
-                            ],
-                            "answer": "Candidate's answer here"
-                        }},
-                        # Add more questions here
-                    ]
-                }}
-                Make sure to evaluate all the answers provided by the candidate.
-                You must evaluate the candidate's answers and check if the candidate's answer matches with the correct option from the given options.
-                If the candidate's answer matches with the correct option, then consider it as a correct answer.
-                If the candidate's answer does not match with the correct option, then consider it as an incorrect answer.
-                You must provide a detailed evaluation report based on the candidate's correct and incorrect answers only.
-                You do not need to consider the depth of the candidate's answer.
-                Analyze the candidate's answers and provide:
-
-                - Strengths
-                - Correct Answers if any
-                - Incorrect Answers if any
-                - Areas of Improvement
-                - Technical Knowledge
-                - Rank the performance on the scale of 1 to 5 where 1 is for worst performance and 5 is for berst performance.
-
-                Format your response as a detailed evaluation report in json format. 
-                The json format should have the following structure:
-                {{
-                    "evaluation": {{
-                        "strengths": "List of strengths",
-                        "correct_answers": "List of correct answers if any",
-                        "incorrect_answers": "List of incorrect answers if any",                        
-                        "technical_knowledge": "Evaluation of technical knowledge",
-                        "areas_of_improvement": "List of areas of improvement",
-                        "performance_rank": 1  # Rank from 1 to 5
-                    }}
-                }}
-                
-                Following is the json string containing questions and answers of a candidate:
-                {self.interview_json}
-                """   
-    
-    @function_tool
-    def get_evaluationreport_json(content: str, filename: str = "evaluation.json") -> dict:
-        try:
-            # Step 1: Remove escaped newlines
-            clean_string = content.encode('utf-8').decode('unicode_escape')
+# Agent output of requests with persist=true, per session; swept by TTL and a size cap in the background.
+artifact_store = ArtifactStore()
 
-            # Step 2: Convert to dictionary
-            data = json.loads(clean_string)
-            with open(filename, "w") as file:
-                    file.write(clean_string)       
-        except Exception as e:
-            print(f"An error occurred while writing to the file: {e}")
-
-    async def execute_evaluator_agent(self, message):
-        """Executes the agent to prepare interview questions."""       
-        evaluator_agent = Agent(
-            name='Evaluator Agent',
-            instructions=self.get_evaluator_prompt(),
-            model='gpt-4o-mini',
-            tools=[self.get_evaluationreport_json])
-                        
-        with trace('Automated Technical Evaluation'):
-            result = await Runner.run(evaluator_agent, message)
-        return result     
+# MinHash signatures of previously generated questions, for cross-set near-duplicate detection.
+question_index = SimilarityIndex(os.getenv('QUESTION_INDEX_PATH', '.question_index.npz'))
 
-@app.route('/generate-questions', methods=['POST'])
-def generate_questions():
-    data = request.json
+DEDUPE_MODES = ('off', 'set', 'bank', 'regenerate')
+
+# Every generated question with its answer key and metadata, for LLM-free test assembly.
+question_bank = QuestionBank()
+
+# Full question sets including their answer keys, keyed by question_set_id; never sent to candidates.
+# Only the TTL bounds it: a key dropped to make room would break the tests and sessions that use it.
+answer_key_store = QuestionSetCache(
+    directory=os.getenv('ANSWER_KEY_DIR', '.answer_keys'),
+    ttl_seconds=int(os.getenv('ANSWER_KEY_TTL_SECONDS', str(90 * 24 * 3600))), max_disk_bytes=None)
+
+# Evaluation reports by canonical sheet hash, for instant re-evaluation and incremental resubmissions.
+evaluation_cache = EvaluationCache()
+
+# The Flask views run their coroutines here instead of on a new event loop per request.
+background_loop = BackgroundLoop()
+
+# Identical concurrent requests share one agent run.
+request_flights = SingleFlight()
+
+# Adaptive test sessions by session id: the pool's question_set_id, the answers so far and the ability estimate.
+session_store = SessionStore()
+
+ADAPTIVE_POOL_SIZE = int(os.getenv('ADAPTIVE_POOL_SIZE', '60'))
+
+# Fresh sets generated ahead of time for the most requested roles, while the model budget is idle.
+prewarm_pool = PrewarmPool(lambda request: pregenerate_question_set(request), model_scheduler)
+
+PREWARM_REQUEST_FIELDS = ('jobdesc', 'criteria', 'message', 'question_count', 'shards', 'topics', 'dedupe')
+
+def publish_question_set(data):
+    """Keeps the answer key server side and returns the candidate facing question set.
+
+    Answer keys that do not match their question's options are not kept.
+    """
+    with metrics.stage('publish'):
+        questions, dropped = drop_mismatched_keys(data.get('questions', []))
+        if dropped:
+            metrics.inc('interview_answer_keys_rejected_total', dropped, endpoint=current_endpoint.get())
+            data = {**data, 'questions': questions}
+        set_id = question_set_id(questions)
+        if answer_key_store.get(set_id) is None:
+            answer_key_store.put(set_id, data)
+        return public_question_set(data, set_id)
+
+def artifact_sink(data):
+    """The artifact sink of a request that asked for its agent output to be kept, or None."""
+    return artifact_store.session(data.get('session_id')) if data.get('persist') else None
+
+def generation_request_error(data):
+    """Validates a question generation request; returns an error body or None."""
+    if not all([data.get('jobdesc'), data.get('criteria'), data.get('message')]):
+        return {'error': 'Missing required fields'}
+    if data.get('cache', 'use') not in ('use', 'bypass', 'refresh'):
+        return {'error': "cache must be one of 'use', 'bypass' or 'refresh'"}
+    question_count = data.get('question_count', DEFAULT_QUESTION_COUNT)
+    if not isinstance(question_count, int) or not 1 <= question_count <= MAX_QUESTION_COUNT:
+        return {'error': f"question_count must be an integer between 1 and {MAX_QUESTION_COUNT}"}
+    shards = data.get('shards')
+    if shards is not None and (not isinstance(shards, int) or shards < 1):
+        return {'error': "shards must be a positive integer"}
+    if data.get('dedupe', 'set') not in DEDUPE_MODES:
+        return {'error': f"dedupe must be one of {', '.join(DEDUPE_MODES)}"}
+    topics = data.get('topics')
+    if topics is not None and (not isinstance(topics, list) or not all(isinstance(t, str) for t in topics)):
+        return {'error': "topics must be a list of strings"}
+    return None
+
+def question_set_key(data, model, topics):
+    """Cache and pre-generation key of a generation request: the role, the request and how the set is shaped."""
+    normalized_topics = sorted({" ".join(topic.split()).casefold() for topic in topics or []})
+    return question_cache.key_for(data.get('jobdesc'), data.get('criteria'), data.get('message'), model,
+                                  data.get('question_count', DEFAULT_QUESTION_COUNT),
+                                  json.dumps(normalized_topics, ensure_ascii=False), data.get('dedupe', 'set'))
+
+async def remove_near_duplicates(question_preparer, message, data, question_count, mode):
+    """Drops near-duplicate questions from a freshly generated set.
+
+    ``set`` compares the questions with each other, ``bank`` also with every
+    previously generated question, and ``regenerate`` additionally asks the
+    agent once for replacements when duplicates left the set short.
+    """
+    if mode == 'off':
+        return data
+    questions = data.get('questions', [])
+    duplicate_filter = NearDuplicateFilter(question_index if mode in ('bank', 'regenerate') else None)
+    kept = await asyncio.to_thread(duplicate_filter.accept, questions, [question_id(q) for q in questions])
+    shortfall = question_count - len(kept)
+    if mode == 'regenerate' and duplicate_filter.dropped and shortfall > 0:
+        existing = "\n".join(f"- {q.get('question')}" for q in kept)
+        refill_message = (f"{message}\nPrepare {shortfall} additional questions that are clearly different "
+                          f"from these existing questions:\n{existing}")
+        refill = await question_preparer.execute_agent(refill_message, AgentRunContext(), shortfall)
+        extra = (refill.data or {}).get('questions', [])
+        kept += await asyncio.to_thread(duplicate_filter.accept, extra, [question_id(q) for q in extra])
+    kept = kept[:question_count]
+    if duplicate_filter.dropped:
+        metrics.inc('interview_near_duplicates_removed_total', len(duplicate_filter.dropped),
+                    endpoint=current_endpoint.get(), mode=mode)
+    await asyncio.to_thread(duplicate_filter.register, question_index, [question_id(q) for q in kept])
+    return {**data, 'questions': kept}
+
+async def prepare_question_set(question_preparer, data, context):
+    """Runs the agent for a generation request, sharded for large sets, and removes near duplicates.
+
+    Returns the question set, or None when the agent did not return a valid one.
+    """
+    message = data.get('message')
+    question_count = data.get('question_count', DEFAULT_QUESTION_COUNT)
+    shards = data.get('shards')
+    if shards is None:
+        shards = 1 if question_count <= DEFAULT_QUESTION_COUNT else default_shard_count(question_count)
+    if shards > 1:
+        await question_preparer.execute_sharded_agent(message, context, question_count, shards, data.get('topics'))
+    else:
+        await question_preparer.execute_agent(message, context, question_count)
+    if context.data is None:
+        return None
+    return await remove_near_duplicates(
+        question_preparer, message, context.data, question_count, data.get('dedupe', 'set'))
+
+async def pregenerate_question_set(request):
+    """Generates one set for the pre-generation pool; returns it with the tokens used."""
+    context = AgentRunContext()
+    data = await prepare_question_set(InterviewQuestionPreparer(request['jobdesc'], request['criteria']),
+                                      request, context)
+    return data, context.usage.get('input_tokens', 0) + context.usage.get('output_tokens', 0)
+
+@deadline_bounded
+@coalesced(request_flights, 'generate-questions')
+async def generate_question_set(data):
+    """Runs /generate-questions; returns the response body and status code."""
+    error = generation_request_error(data)
+    if error:
+        return error, 400
     jobdesc = data.get('jobdesc')
     criteria = data.get('criteria')
     message = data.get('message')
-    if not all([jobdesc, criteria, message]):
-        return jsonify({'error': 'Missing required fields'}), 400
+    cache_mode = data.get('cache', 'use')
+    question_count = data.get('question_count', DEFAULT_QUESTION_COUNT)
 
     question_preparer = InterviewQuestionPreparer(jobdesc, criteria)
-    prepared_questions = asyncio.run(question_preparer.execute_agent(message))
-    # Try to parse as JSON if it's a string
-    if not os.path.exists("questions.json"):
-        return jsonify({"error": "JSON file not found"}), 404
-    
-    # Read the JSON file
-    with open("questions.json", "r") as f:
-        data = json.load(f)
-    
-    # Send JSON response
-    return jsonify(data)
+    cache_key = question_set_key(data, question_preparer.model, data.get('topics'))
+    if cache_mode == 'use':
+        with metrics.stage('cache_lookup'):
+            cached = await asyncio.to_thread(question_cache.get, cache_key)
+        if cached is not None:
+            return await asyncio.to_thread(publish_question_set, cached), 200
+    # Only misses count: a role answered from the cache would never draw on its pool.
+    prewarm_pool.record(cache_key, {key: data[key] for key in PREWARM_REQUEST_FIELDS if key in data})
 
-@app.route('/evaluate', methods=['POST'])
-def evaluate():
-    data = request.json
+    context = AgentRunContext(sink=artifact_sink(data))
+    # Sets pre-generated for popular roles are only de-duplicated within the set.
+    if data.get('pool', True) and data.get('dedupe', 'set') in ('off', 'set'):
+        with metrics.stage('pool_lookup'):
+            context.data = prewarm_pool.take(cache_key)
+        if context.data is not None:
+            context.persist('questions')
+    if context.data is None:
+        context.data = await prepare_question_set(question_preparer, data, context)
+    if context.data is None:
+        return {"error": "The agent did not return a valid questions json"}, 502
+
+    with metrics.stage('store'):
+        await asyncio.to_thread(question_bank.add_questions, context.data['questions'], jobdesc, criteria)
+        if cache_mode != 'bypass':
+            await asyncio.to_thread(question_cache.put, cache_key, context.data)
+    return await asyncio.to_thread(publish_question_set, context.data), 200
+
+async def stream_question_set(data):
+    """Runs /generate-questions/stream; yields Server-Sent Events.
+
+    Emits a ``question`` event per completed question, then a ``complete``
+    event with the full set (or an ``error`` event). When the deadline passes
+    first, the ``complete`` event carries the questions sent so far, published
+    as a set of their own and marked ``partial``. Expects a validated request.
+    """
     jobdesc = data.get('jobdesc')
     criteria = data.get('criteria')
-    interview_json_str = data.get('interview_json')
-    if not all([jobdesc, criteria, interview_json_str]):
-        return jsonify({'error': 'Missing required fields'}), 400
-    interview_json = json.loads(interview_json_str)
-    evaluator = InterviewEvaluator(jobdesc, criteria, interview_json)
+    message = data.get('message')
+    cache_mode = data.get('cache', 'use')
+    question_count = data.get('question_count', DEFAULT_QUESTION_COUNT)
+
+    question_preparer = InterviewQuestionPreparer(jobdesc, criteria)
+    # The stream always generates one unsharded set, so its topics do not shape it.
+    cache_key = question_set_key(data, question_preparer.model, None)
+    if cache_mode == 'use':
+        cached = await asyncio.to_thread(question_cache.get, cache_key)
+        if cached is not None:
+            for index, question in enumerate(cached.get('questions', [])):
+                yield sse_event('question', {'index': index, 'question': public_question(question)})
+            yield sse_event('complete', await asyncio.to_thread(publish_question_set, cached))
+            return
+
+    context = AgentRunContext(sink=artifact_sink(data))
+    dedupe = data.get('dedupe', 'set')
+    duplicate_filter = NearDuplicateFilter(question_index if dedupe in ('bank', 'regenerate') else None)
+    streamed = []
+    try:
+        async with within_deadline():
+            async for question in question_preparer.stream_agent(message, context, question_count):
+                # Duplicates are dropped as they arrive; already sent questions cannot be taken back.
+                if dedupe != 'off' and not await asyncio.to_thread(duplicate_filter.accept, [question],
+                                                                   [question_id(question)]):
+                    metrics.inc('interview_near_duplicates_removed_total', endpoint=current_endpoint.get(), mode=dedupe)
+                    continue
+                yield sse_event('question', {'index': len(streamed), 'question': public_question(question)})
+                streamed.append(question)
+    except TimeoutError:
+        metrics.inc('interview_requests_cancelled_total', endpoint=current_endpoint.get(), reason='deadline')
+        if not streamed:
+            yield sse_event('error', {'error': "The request deadline was exceeded before the first question was complete"})
+            return
+        # Partial sets go to the bank and can be answered and graded, but are never cached for the full request.
+        await asyncio.to_thread(question_bank.add_questions, streamed, jobdesc, criteria)
+        published = await asyncio.to_thread(publish_question_set, {'questions': streamed})
+        yield sse_event('complete', {**published, 'partial': True,
+                                     'reason': 'deadline_exceeded', 'question_count': question_count})
+        return
+    except Exception as e:
+        yield sse_event('error', {'error': f"Question generation failed: {e}"})
+        return
+    if context.data is None:
+        yield sse_event('error', {'error': "The agent did not return a valid questions json"})
+        return
+    if dedupe != 'off':
+        context.data = {**context.data, 'questions': streamed}
+        await asyncio.to_thread(duplicate_filter.register, question_index)
+
+    context.persist('questions')
+    await asyncio.to_thread(question_bank.add_questions, context.data['questions'], jobdesc, criteria)
+    if cache_mode != 'bypass':
+        await asyncio.to_thread(question_cache.put, cache_key, context.data)
+    yield sse_event('complete', await asyncio.to_thread(publish_question_set, context.data))
+
+def assembly_request_error(data):
+    """Validates a test assembly request; returns an error body or None."""
+    if not all([data.get('jobdesc'), data.get('criteria')]):
+        return {'error': 'Missing required fields'}
+    question_count = data.get('question_count', DEFAULT_QUESTION_COUNT)
+    if not isinstance(question_count, int) or not 1 <= question_count <= MAX_QUESTION_COUNT:
+        return {'error': f"question_count must be an integer between 1 and {MAX_QUESTION_COUNT}"}
+    for field in ('tags', 'difficulties'):
+        value = data.get(field)
+        if value is not None and (not isinstance(value, list) or not all(isinstance(v, str) for v in value)):
+            return {'error': f"{field} must be a list of strings"}
+    return None
+
+@deadline_bounded
+async def assemble_test(data):
+    """Runs /assemble-test; returns the response body and status code.
+
+    Builds a test from the question bank, stratified across tags and
+    difficulty and excluding questions the candidate has already seen. The
+    agent is only asked for the questions the bank cannot cover, unless
+    ``generate_missing`` is false.
+    """
+    error = assembly_request_error(data)
+    if error:
+        return error, 400
+    jobdesc = data.get('jobdesc')
+    criteria = data.get('criteria')
+    question_count = data.get('question_count', DEFAULT_QUESTION_COUNT)
+    candidate_id = data.get('candidate_id')
+
+    questions = await asyncio.to_thread(
+        question_bank.sample, question_count, tags=data.get('tags'), difficulties=data.get('difficulties'),
+        jobdesc=jobdesc, criteria=criteria, candidate_id=candidate_id)
+    from_bank = len(questions)
+    shortfall = question_count - from_bank
+    if shortfall > 0 and data.get('generate_missing', True):
+        message = data.get('message') or f"Prepare {shortfall} questions for the interview based on the job description and criteria provided."
+        if data.get('tags'):
+            message += f"\nThe questions must assess these skills: {', '.join(data['tags'])}."
+        context = await InterviewQuestionPreparer(jobdesc, criteria).execute_agent(message, AgentRunContext(), shortfall)
+        generated = (context.data or {}).get('questions', [])
+        await asyncio.to_thread(question_bank.add_questions, generated, jobdesc, criteria)
+        duplicate_filter = NearDuplicateFilter()
+        await asyncio.to_thread(duplicate_filter.accept, questions, [question_id(q) for q in questions])
+        questions += (await asyncio.to_thread(duplicate_filter.accept, generated,
+                                              [question_id(q) for q in generated]))[:shortfall]
+    if not questions:
+        return {'error': 'No questions available for this role'}, 404
+
+    if candidate_id is not None:
+        await asyncio.to_thread(question_bank.mark_seen, candidate_id, questions)
+    body = await asyncio.to_thread(publish_question_set, {'questions': questions})
+    body['source'] = {'bank': from_bank, 'generated': len(questions) - from_bank}
+    return body, 200
+
+def evaluation_request_error(data):
+    """Validates an evaluation request; returns an error body or None."""
+    if not all([data.get('jobdesc'), data.get('criteria')]) or not (data.get('interview_json') or data.get('answers')):
+        return {'error': 'Missing required fields'}
+    if data.get('answers') is not None:
+        if not data.get('question_set_id'):
+            return {'error': "question_set_id is required with answers"}
+        if not isinstance(data.get('answers'), dict):
+            return {'error': "answers must map question ids to lists of option ids"}
+    if data.get('cache', 'use') not in ('use', 'bypass', 'refresh'):
+        return {'error': "cache must be one of 'use', 'bypass' or 'refresh'"}
+    if not isinstance(data.get('incremental', True), bool):
+        return {'error': "incremental must be a boolean"}
+    chunk_size = data.get('chunk_size', EVALUATION_CHUNK_SIZE)
+    if isinstance(chunk_size, bool) or not isinstance(chunk_size, int) or chunk_size < 0:
+        return {'error': "chunk_size must be a non-negative integer"}
+    return None
+
+async def narrate_grading(jobdesc, criteria, grading, cache_mode, sink=None):
+    """Runs the narrative agent for a locally graded sheet, reusing narratives of the same outcome."""
+    evaluator = InterviewEvaluator(jobdesc, criteria, None, grading)
+    key = narrative_key(jobdesc, criteria, grading, evaluator.model)
+    narrative = await asyncio.to_thread(evaluation_cache.get_narrative, key) if cache_mode == 'use' else None
+    if narrative is None:
+        context = AgentRunContext(sink=sink)
+        await evaluator.execute_evaluator_agent(
+            "Evaluate the candidate's answers and provide a detailed evaluation report.", context)
+        if context.data is None:
+            return None
+        narrative = context.data
+        if cache_mode != 'bypass':
+            await asyncio.to_thread(evaluation_cache.put_narrative, key, narrative)
+    return graded_report(grading, narrative)
+
+async def judge_answers(jobdesc, criteria, interview_json, candidate_id, cache_mode, incremental, sink=None,
+                        chunk_size=EVALUATION_CHUNK_SIZE):
+    """Runs the full evaluator agent, or reuses a cached report of the same sheet.
+
+    In incremental mode a candidate's resubmission only has its changed
+    answers judged again; the report is then re-aggregated from the cached
+    verdicts of the unchanged questions and keeps the previous narrative.
+    Sheets longer than ``chunk_size`` are evaluated in concurrent groups.
+    """
+    questions = interview_json.get('questions', [])
     message = "Evaluate the candidate's answers and provide a detailed evaluation report."
-    # Execute the evaluation agent
-    evaluation_report = asyncio.run(evaluator.execute_evaluator_agent(message))
-    # Try to parse as JSON if it's a string
-    if not os.path.exists("evaluation.json"):
-        return jsonify({"error": "JSON file not found"}), 404
-    
-    # Read the JSON file
-    with open("evaluation.json", "r") as f:
-        data = json.load(f)
-    
-    # Send JSON response
-    return jsonify(data)
+    model = InterviewEvaluator(jobdesc, criteria, interview_json).model
+    key = evaluation_key(jobdesc, criteria, questions, model)
+    lineage = lineage_key(jobdesc, criteria, questions, model, candidate_id) if candidate_id is not None else None
+    if cache_mode == 'use':
+        cached = await asyncio.to_thread(evaluation_cache.get, key)
+        if cached is not None:
+            return cached['report']
+
+    report = verdicts = None
+    previous = await asyncio.to_thread(evaluation_cache.previous, lineage) \
+        if cache_mode == 'use' and incremental and lineage else None
+    changed = changed_questions(questions, previous) if previous else None
+    if changed is not None and len(changed) <= INCREMENTAL_MAX_CHANGED_RATIO * len(questions):
+        rejudged = {}
+        if changed:
+            context = AgentRunContext(sink=sink)
+            await InterviewEvaluator(jobdesc, criteria, {'questions': changed}).evaluate(message, context, chunk_size)
+            rejudged = extract_verdicts(context.data, changed)
+        if len(rejudged) == len(changed):
+            verdicts = {**previous['verdicts'], **rejudged}
+            report = merge_report(previous['report'], questions, verdicts)
+            report['incremental'] = {'rejudged': len(changed), 'reused': len(questions) - len(changed)}
+
+    if report is None:
+        context = AgentRunContext(sink=sink)
+        await InterviewEvaluator(jobdesc, criteria, interview_json).evaluate(message, context, chunk_size)
+        if context.data is None:
+            return None
+        report = context.data
+        verdicts = extract_verdicts(report, questions)
+    if cache_mode != 'bypass':
+        await asyncio.to_thread(evaluation_cache.put, key, report, questions, verdicts, lineage)
+    return report
+
+def read_answer_sheet(data):
+    """Returns the answer sheet of an evaluation request with the question and option text filled in.
+
+    Compact ``answers`` are rehydrated from the stored question set; a full
+    ``interview_json`` may be a native json object or a json string.
+    """
+    if data.get('answers') is None:
+        return parse_interview_json(data.get('interview_json'))
+    set_id = data.get('question_set_id')
+    question_set = answer_key_store.get(set_id)
+    if question_set is None:
+        raise LookupError(f"Unknown question_set_id '{set_id}'; submit the full interview_json instead")
+    return rehydrate_answers(question_set, data.get('answers'), set_id)
+
+@deadline_bounded
+@coalesced(request_flights, 'evaluate')
+async def evaluate_answers(data):
+    """Runs /evaluate; returns the response body and status code."""
+    error = evaluation_request_error(data)
+    if error:
+        return error, 400
+    jobdesc = data.get('jobdesc')
+    criteria = data.get('criteria')
+    try:
+        with metrics.stage('request_parse'):
+            interview_json = await asyncio.to_thread(read_answer_sheet, data)
+    except LookupError as e:
+        return {'error': str(e)}, 404
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    # Grade locally when the answer key of this question set is known; the agent then only writes the narrative.
+    with metrics.stage('local_grading'):
+        set_id = data.get('question_set_id') or interview_json.get('question_set_id') \
+            or question_set_id(interview_json.get('questions', []))
+        answer_key = await asyncio.to_thread(answer_key_store.get, set_id)
+        grading = grade(interview_json, answer_key) if has_answer_key(answer_key) else None
+    if grading is not None and data.get('narrative') is False:
+        return graded_report(grading), 200
+
+    cache_mode = data.get('cache', 'use')
+    sink = artifact_sink(data)
+    if grading is not None:
+        report = await narrate_grading(jobdesc, criteria, grading, cache_mode, sink)
+    else:
+        candidate_id = data.get('candidate_id', interview_json.get('candidate_id'))
+        report = await judge_answers(jobdesc, criteria, interview_json, candidate_id, cache_mode,
+                                     data.get('incremental', True), sink, data.get('chunk_size', EVALUATION_CHUNK_SIZE))
+    if report is None:
+        return {"error": "The agent did not return a valid evaluation json"}, 502
+    return report, 200
+
+def batch_request_error(data):
+    """Validates a batch evaluation request; returns an error body or None."""
+    if not all([data.get('jobdesc'), data.get('criteria'), data.get('question_set'), data.get('answer_sheets')]):
+        return {'error': 'Missing required fields'}
+    if not isinstance(data.get('answer_sheets'), list):
+        return {'error': 'answer_sheets must be a list'}
+    for index, sheet in enumerate(data['answer_sheets']):
+        answers = sheet.get('answers', []) if isinstance(sheet, dict) else sheet
+        if not isinstance(answers, (list, dict)):
+            return {'error': f"answer_sheets[{index}] must have its answers as a list or an object"}
+    # The stream's headers go out before the set is used, so a malformed one has to be refused here.
+    try:
+        parse_interview_json(data.get('question_set'), 'question_set')
+    except ValueError as e:
+        return {'error': str(e)}
+    concurrency = data.get('concurrency', BATCH_CONCURRENCY)
+    if not isinstance(concurrency, int) or not 1 <= concurrency <= BATCH_MAX_CONCURRENCY:
+        return {'error': f"concurrency must be an integer between 1 and {BATCH_MAX_CONCURRENCY}"}
+    return None
+
+async def stream_batch_evaluation(data):
+    """Runs /evaluate/batch; yields Server-Sent Events.
+
+    Evaluates many answer sheets for one question set with bounded concurrency,
+    emitting a ``report`` event per candidate as soon as it is done and a final
+    ``summary`` event, marked ``partial`` when the deadline cut the batch short.
+    Expects a validated request.
+    """
+    started = time.perf_counter()
+    # Batches give way to interactive requests when the model budget runs short.
+    current_priority.set('batch')
+    jobdesc = data.get('jobdesc')
+    criteria = data.get('criteria')
+    question_set = parse_interview_json(data.get('question_set'), 'question_set')
+    set_id = data.get('question_set_id') or question_set.get('question_set_id') \
+        or question_set_id(question_set.get('questions', []))
+    answer_key = await asyncio.to_thread(answer_key_store.get, set_id)
+    if not has_answer_key(answer_key):
+        answer_key = None
+
+    # One evaluator for the whole batch: the jobdesc, criteria and questions lead every
+    # candidate's message and the answers come last, so the provider can reuse the cached prefix.
+    questions_only = {'questions': [public_question(q) for q in question_set.get('questions', [])]}
+    shared_evaluator = InterviewEvaluator(jobdesc, criteria, questions_only)
+    semaphore = asyncio.Semaphore(data.get('concurrency', BATCH_CONCURRENCY))
+
+    async def evaluate_candidate(index, sheet):
+        candidate_id = sheet.get('candidate_id', index) if isinstance(sheet, dict) else index
+        answers = sheet.get('answers', []) if isinstance(sheet, dict) else sheet
+        # Answers keyed by question id are compact option ids; a list holds text answers in question order.
+        if isinstance(answers, dict):
+            interview_json = rehydrate_answers(question_set, answers)
+        else:
+            interview_json = build_answer_sheet(question_set, answers)
+        grading = grade(interview_json, answer_key) if answer_key else None
+        async with semaphore:
+            if grading is not None and data.get('narrative') is False:
+                return candidate_id, graded_report(grading)
+            if grading is not None:
+                evaluator = InterviewEvaluator(jobdesc, criteria, interview_json, grading)
+                message = "Write the narrative part of the candidate's evaluation report."
+            else:
+                evaluator = shared_evaluator
+                answered = [answer_ids(q, q.get('answer')) for q in interview_json['questions']]
+                message = ("Evaluate the candidate's answers and provide a detailed evaluation report.\n"
+                           f"Candidate's answers in question order: {json.dumps(answered, ensure_ascii=False)}")
+            # Rate limits and transient errors are retried by the model scheduler.
+            context = await evaluator.execute_evaluator_agent(message, AgentRunContext())
+        if context.data is None:
+            raise ValueError("The agent did not return a valid evaluation json")
+        return candidate_id, graded_report(grading, context.data) if grading is not None else context.data
+
+    async def guarded(index, sheet):
+        try:
+            return True, await evaluate_candidate(index, sheet)
+        except Exception as e:
+            candidate_id = sheet.get('candidate_id', index) if isinstance(sheet, dict) else index
+            return False, (candidate_id, str(e))
+
+    results, failures, timed_out = [], [], False
+    tasks = [asyncio.ensure_future(guarded(i, sheet)) for i, sheet in enumerate(data.get('answer_sheets'))]
+    try:
+        async with within_deadline():
+            for finished in asyncio.as_completed(tasks):
+                ok, (candidate_id, payload) = await finished
+                if ok:
+                    results.append(payload)
+                    yield sse_event('report', {'candidate_id': candidate_id, 'report': payload})
+                else:
+                    failures.append({'candidate_id': candidate_id, 'error': payload})
+                    yield sse_event('error', {'candidate_id': candidate_id, 'error': payload})
+    except TimeoutError:
+        timed_out = True
+        metrics.inc('interview_requests_cancelled_total', endpoint=current_endpoint.get(), reason='deadline')
+    finally:
+        for task in tasks:
+            task.cancel()
+    summary = summarize_batch(results, failures, time.perf_counter() - started)
+    if timed_out:
+        summary = {**summary, 'partial': True, 'reason': 'deadline_exceeded',
+                   'unfinished': len(tasks) - len(results) - len(failures)}
+    yield sse_event('summary', summary)
+
+def session_request_error(data):
+    """Validates an adaptive session request; returns an error body or None."""
+    if not all([data.get('jobdesc'), data.get('criteria')]):
+        return {'error': 'Missing required fields'}
+    max_questions = data.get('max_questions', ADAPTIVE_MAX_QUESTIONS)
+    if not isinstance(max_questions, int) or not 1 <= max_questions <= MAX_QUESTION_COUNT:
+        return {'error': f"max_questions must be an integer between 1 and {MAX_QUESTION_COUNT}"}
+    target = data.get('target_standard_error', ADAPTIVE_TARGET_SE)
+    if isinstance(target, bool) or not isinstance(target, (int, float)) or target <= 0:
+        return {'error': "target_standard_error must be a positive number"}
+    tags = data.get('tags')
+    if tags is not None and (not isinstance(tags, list) or not all(isinstance(t, str) for t in tags)):
+        return {'error': "tags must be a list of strings"}
+    return None
+
+async def session_pool(data):
+    """Returns the answer-keyed question pool of a new session and its question_set_id.
+
+    The pool is the given stored question set or, without one, questions
+    from the bank; a set is generated only when the bank has too few.
+    """
+    set_id = data.get('question_set_id')
+    if set_id:
+        question_set = await asyncio.to_thread(answer_key_store.get, set_id)
+        return (question_set, set_id) if has_answer_key(question_set) else (None, set_id)
+    questions = await asyncio.to_thread(
+        question_bank.sample, ADAPTIVE_POOL_SIZE, tags=data.get('tags'), jobdesc=data.get('jobdesc'),
+        criteria=data.get('criteria'), candidate_id=data.get('candidate_id'))
+    if len(questions) < min(data.get('max_questions', ADAPTIVE_MAX_QUESTIONS), ADAPTIVE_POOL_SIZE):
+        body, status = await generate_question_set({
+            'jobdesc': data.get('jobdesc'), 'criteria': data.get('criteria'),
+            'message': "Prepare questions across all difficulty levels for an adaptive interview."})
+        if status != 200:
+            return None, None
+        set_id = body['question_set_id']
+        return await asyncio.to_thread(answer_key_store.get, set_id), set_id
+    set_id = (await asyncio.to_thread(publish_question_set, {'questions': questions}))['question_set_id']
+    return {'questions': questions}, set_id
+
+def advance_session(session, pool):
+    """Serves the next question, or finishes the session once the estimate is confident enough."""
+    asked = {response['question_id'] for response in session['responses']}
+    questions = pool.get('questions', [])
+    reason = stop_reason(len(asked), session['standard_error'], len(questions) - len(asked),
+                         session['max_questions'], session['target_standard_error'])
+    if reason is not None:
+        session.update(status='finished', stop_reason=reason, pending=None)
+        return None
+    covered = covered_tags([q for q in questions if question_id(q) in asked])
+    question = next_question(questions, asked, covered, session['ability'])
+    session['pending'] = question_id(question)
+    if session['candidate_id'] is not None:
+        question_bank.mark_seen(session['candidate_id'], [question])
+    return question
+
+def session_view(session, question=None):
+    """Formats a session for the candidate; answers and their verdicts stay server side."""
+    body = {
+        'session_id': session['session_id'],
+        'status': session['status'],
+        'question_set_id': session['question_set_id'],
+        'progress': {'asked': len(session['responses']), 'max_questions': session['max_questions'],
+                     'ability': round(session['ability'], 3), 'standard_error': round(session['standard_error'], 3)},
+    }
+    if question is not None:
+        body['question'] = public_question(question)
+    if session['status'] == 'finished':
+        body['stop_reason'] = session['stop_reason']
+    return body
+
+def load_session(session_id):
+    """Returns the session and its question pool, or (None, None)."""
+    session = session_store.get(session_id)
+    pool = answer_key_store.get(session['question_set_id']) if session else None
+    return (session, pool) if pool is not None else (None, None)
+
+def pending_question(session, pool):
+    return next((q for q in pool.get('questions', []) if question_id(q) == session['pending']), None)
+
+@deadline_bounded
+async def start_session(data):
+    """Runs POST /sessions; returns the response body with the first question and the status code."""
+    error = session_request_error(data)
+    if error:
+        return error, 400
+    pool, set_id = await session_pool(data)
+    if pool is None:
+        return {'error': 'No questions with an answer key available for this session'}, 404
+    ability, standard_error = estimate_ability([])
+    session = {
+        'session_id': uuid.uuid4().hex,
+        'jobdesc': data.get('jobdesc'),
+        'criteria': data.get('criteria'),
+        'question_set_id': set_id,
+        'candidate_id': data.get('candidate_id'),
+        'max_questions': data.get('max_questions', ADAPTIVE_MAX_QUESTIONS),
+        'target_standard_error': data.get('target_standard_error', ADAPTIVE_TARGET_SE),
+        'responses': [],
+        'pending': None,
+        'status': 'active',
+        'stop_reason': None,
+        'ability': ability,
+        'standard_error': standard_error,
+        'created_at': time.time(),
+    }
+    question = await asyncio.to_thread(advance_session, session, pool)
+    await asyncio.to_thread(session_store.put, session['session_id'], session)
+    return session_view(session, question), 201
+
+def session_status(session_id):
+    """Runs GET /sessions/<id>; returns the response body and status code."""
+    session, pool = load_session(session_id)
+    if session is None:
+        return {'error': 'Session not found'}, 404
+    return session_view(session, pending_question(session, pool)), 200
+
+def answer_session(session_id, data):
+    """Runs POST /sessions/<id>/answers: grades the answer, updates the estimate and serves the next question.
+
+    The session is read and written back in one transaction, so two answers
+    sent at once cannot both be taken for the same pending question.
+    """
+    if not isinstance(data, dict) or not data.get('question_id'):
+        return {'error': 'Missing required fields'}, 400
+    return session_store.update(session_id, lambda session: record_answer(session, data))
+
+def record_answer(session, data):
+    """Applies an answer to the session in place; returns the response body and status, and whether it changed."""
+    pool = answer_key_store.get(session['question_set_id']) if session else None
+    if pool is None:
+        return ({'error': 'Session not found'}, 404), False
+    if session['status'] != 'active':
+        return ({'error': 'The session is finished'}, 409), False
+    if data.get('question_id') != session['pending']:
+        return ({'error': f"Expected an answer to question '{session['pending']}'"}, 409), False
+    question = pending_question(session, pool)
+    try:
+        sheet = rehydrate_answers({'questions': [question]}, {session['pending']: data.get('answer')})
+    except ValueError as e:
+        return ({'error': str(e)}, 400), False
+    correct = grade(sheet, pool)['score']['correct'] == 1
+
+    session['responses'].append({'question_id': session['pending'], 'answer': data.get('answer'), 'correct': correct})
+    questions = {question_id(q): q for q in pool.get('questions', [])}
+    ability, standard_error = estimate_ability(
+        [(item_difficulty(questions[r['question_id']]), r['correct']) for r in session['responses']])
+    session.update(ability=ability, standard_error=standard_error)
+    question = advance_session(session, pool)
+    return (session_view(session, question), 200), True
+
+@deadline_bounded
+async def session_report(session_id, data):
+    """Runs POST /sessions/<id>/report; returns an evaluation report of the answered questions.
+
+    The report has the shape of a fixed-set evaluation. Its performance rank
+    comes from the share of the whole pool the estimated ability is expected
+    to answer correctly, so it stays comparable with a full test.
+    """
+    session, pool = await asyncio.to_thread(load_session, session_id)
+    if session is None:
+        return {'error': 'Session not found'}, 404
+    if not session['responses']:
+        return {'error': 'The session has no answers yet'}, 409
+    answers = {response['question_id']: response['answer'] for response in session['responses']}
+    asked = [q for q in pool.get('questions', []) if question_id(q) in answers]
+    grading = grade(rehydrate_answers({'questions': asked}, answers), pool)
+    expected = expected_score(pool.get('questions', []), session['ability'])
+    grading['performance_rank'] = performance_rank(expected)
+    if data.get('narrative') is False:
+        report = graded_report(grading)
+    else:
+        report = await narrate_grading(session['jobdesc'], session['criteria'], grading, data.get('cache', 'use'))
+    if report is None:
+        return {"error": "The agent did not return a valid evaluation json"}, 502
+    # Whoever holds the session id can ask for the report, so it leaves the answer key out.
+    report['evaluation']['incorrect_answers'] = [{k: v for k, v in item.items() if k not in ANSWER_KEY_FIELDS}
+                                                 for item in report['evaluation']['incorrect_answers']]
+    report['adaptive'] = {
+        'ability': round(session['ability'], 3),
+        'standard_error': round(session['standard_error'], 3),
+        'questions_asked': len(session['responses']),
+        'pool_size': len(pool.get('questions', [])),
+        'expected_percentage': round(expected * 100, 2),
+        'stop_reason': session['stop_reason'],
+    }
+    return report, 200
+
+job_store = JobStore()
+
+job_pool = JobWorkerPool(job_store, {
+    'generate-questions': generate_question_set,
+    'assemble-test': assemble_test,
+    'evaluate': evaluate_answers,
+})
+
+JOB_VALIDATORS = {
+    'generate-questions': generation_request_error,
+    'assemble-test': assembly_request_error,
+    'evaluate': evaluation_request_error,
+}
+
+MAX_JOB_WAIT_SECONDS = 60
+
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def submit_job(kind, data):
+    """Queues a job; returns the response body and status code."""
+    if not isinstance(data, dict):
+        return {'error': 'Request body must be a json object'}, 400
+    error = JOB_VALIDATORS[kind](data)
+    if error:
+        return error, 400
+    job_id = job_pool.submit(kind, data)
+    return {'job_id': job_id, 'status': 'queued', 'status_url': f'/jobs/{job_id}'}, 202
+
+def job_status(job):
+    """Formats a job for the status endpoint."""
+    return {key: job[key] for key in
+            ('id', 'kind', 'status', 'status_code', 'result', 'error', 'attempts', 'created_at', 'started_at', 'finished_at')}
+
+def run_housekeeping():
+    """Sweeps the artifact store now; only artifacts past their TTL or over the size cap are removed."""
+    result = artifact_store.sweep()
+    return {"message": "Housekeeping completed, expired files removed.", **result}
+
+def service_stats():
+    return {"question_cache": question_cache.snapshot(), "evaluation_cache": evaluation_cache.snapshot(),
+            "jobs": job_pool.metrics(), "question_bank": question_bank.stats(), "tokens": token_stats.snapshot(),
+            "scheduler": model_scheduler.snapshot(), "coalescing": request_flights.snapshot(),
+            "sessions": session_store.snapshot(), "prewarm": prewarm_pool.snapshot(),
+            "artifacts": artifact_store.snapshot(), "engine": engine_warm_up.snapshot(),
+            "tracing": trace_sink.snapshot()}
+
+@app.before_request
+def start_job_workers():
+    # Picks up jobs queued before a restart without waiting for a new submission.
+    job_pool.ensure_started()
+    prewarm_pool.ensure_started()
+    artifact_store.ensure_started()
+    engine_warm_up.ensure_started()
+
+@app.before_request
+def start_request_timer():
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    # Agent and tool stages further down the call stack read the endpoint label from here.
+    current_endpoint.set(g.metrics_endpoint)
+    # Agent runs started for this request are cancelled once its deadline passes.
+    current_deadline.set(request_deadline(g.metrics_endpoint, request.headers.get(DEADLINE_HEADER)))
+    g.metrics_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    # Streaming responses are timed up to their headers; their model time is in the stage metrics.
+    endpoint = g.get('metrics_endpoint', 'unmatched')
+    metrics.observe('http_request_duration_seconds', time.perf_counter() - g.get('metrics_started', time.perf_counter()),
+                    endpoint=endpoint, method=request.method)
+    metrics.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+@app.route('/generate-questions', methods=['POST'])
+def generate_questions():
+    body, status = background_loop.run(generate_question_set(request.json))
+    return jsonify(body), status
+
+@app.route('/generate-questions/stream', methods=['POST'])
+def generate_questions_stream():
+    data = request.json
+    error = generation_request_error(data)
+    if error:
+        return jsonify(error), 400
+    events = background_loop.iterate(stream_question_set(data))
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/assemble-test', methods=['POST'])
+def assemble():
+    body, status = background_loop.run(assemble_test(request.json))
+    return jsonify(body), status
+
+@app.route('/evaluate', methods=['POST'])
+def evaluate():
+    body, status = background_loop.run(evaluate_answers(request.json))
+    return jsonify(body), status
+
+@app.route('/evaluate/batch', methods=['POST'])
+def evaluate_batch():
+    data = request.json
+    error = batch_request_error(data)
+    if error:
+        return jsonify(error), 400
+    events = background_loop.iterate(stream_batch_evaluation(data))
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/sessions', methods=['POST'])
+def create_session():
+    """Endpoint to start an adaptive test session; returns the first question."""
+    body, status = background_loop.run(start_session(request.json))
+    return jsonify(body), status
+
+@app.route('/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    body, status = session_status(session_id)
+    return jsonify(body), status
+
+@app.route('/sessions/<session_id>/answers', methods=['POST'])
+def answer(session_id):
+    """Endpoint to answer the pending question; returns the next one or the finished session."""
+    body, status = answer_session(session_id, request.json)
+    return jsonify(body), status
+
+@app.route('/sessions/<session_id>/report', methods=['POST'])
+def report(session_id):
+    body, status = background_loop.run(session_report(session_id, request.get_json(silent=True) or {}))
+    return jsonify(body), status
+
+@app.route('/jobs/<kind>', methods=['POST'])
+def create_job(kind):
+    if kind not in JOB_VALIDATORS:
+        return jsonify({'error': f"Unknown job kind '{kind}'"}), 404
+    body, status = submit_job(kind, request.get_json(silent=True))
+    return jsonify(body), status
+
+@app.route('/jobs/metrics', methods=['GET'])
+def jobs_metrics():
+    """Endpoint to report queue depth and job ages."""
+    return jsonify(job_pool.metrics())
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Returns the job; ``?wait=<seconds>`` long-polls until it finished."""
+    wait = min(request.args.get('wait', 0, type=float), MAX_JOB_WAIT_SECONDS)
+    job = job_store.wait(job_id, wait) if wait > 0 else job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status(job))
 
 @app.route('/housekeeping', methods=['get'])
 def housekeeping():
     """Endpoint to clean up files created during the interview process."""
-    files_to_remove = ["questions.json", "evaluation.json"]
-    for file in files_to_remove:
-        if os.path.exists(file):
-            os.remove(file)
-    return jsonify({"message": "Housekeeping completed, files removed."})
+    return jsonify(run_housekeeping())
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe; answers 503 until the engines are warmed up, starting that on the first probe."""
+    body = engine_warm_up.snapshot()
+    return jsonify(body), 200 if engine_warm_up.ready() else 503
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Endpoint to report cache hit/miss counters."""
+    return jsonify(service_stats())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Endpoint to expose latency, token and error metrics in the Prometheus text format."""
+    return Response(metrics.render(), mimetype=METRICS_CONTENT_TYPE)
 
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
\ No newline at end of file
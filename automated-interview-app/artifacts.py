@@ -0,0 +1,226 @@
+"""Per-request agent run context and the on-disk store of the agents' output.
+
+Artifacts are kept per session and request, as
+``<ARTIFACT_DIR>/<session id>/<request id>-<kind>.json[.gz]``, and every write
+goes to a unique temporary file first, so concurrent requests never see or
+clobber each other's files. A background sweeper drops artifacts past
+``ARTIFACT_TTL_SECONDS`` and then the oldest ones while the store is above
+``ARTIFACT_MAX_BYTES``, so nothing has to call a cleanup endpoint.
+
+Artifacts hold the raw agent output, answer keys included, so they are
+for server-side inspection only and are not served over HTTP.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from metrics import metrics
+
+ARTIFACT_DIR = os.getenv('ARTIFACT_DIR', 'artifacts')
+ARTIFACT_TTL_SECONDS = int(os.getenv('ARTIFACT_TTL_SECONDS', str(24 * 3600)))
+ARTIFACT_MAX_BYTES = int(os.getenv('ARTIFACT_MAX_BYTES', str(512 * 1024 * 1024)))
+ARTIFACT_COMPRESS = os.getenv('ARTIFACT_COMPRESS', 'false').lower() in ('1', 'true', 'yes')
+ARTIFACT_SWEEP_INTERVAL_SECONDS = float(os.getenv('ARTIFACT_SWEEP_INTERVAL_SECONDS', '300'))
+
+DEFAULT_SESSION = 'anonymous'
+
+SAFE_NAME = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def safe_name(value):
+    """Uses ids that are safe as file names as they are and hashes anything else."""
+    value = str(value)
+    return value if SAFE_NAME.match(value) else hashlib.sha256(value.encode('utf-8')).hexdigest()[:32]
+
+
+class ArtifactStore:
+    """Session-scoped, size and TTL bounded on-disk copies of agent output."""
+
+    def __init__(self, directory=ARTIFACT_DIR, ttl_seconds=ARTIFACT_TTL_SECONDS, max_bytes=ARTIFACT_MAX_BYTES,
+                 compress=ARTIFACT_COMPRESS, sweep_interval=ARTIFACT_SWEEP_INTERVAL_SECONDS):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._written = 0
+        self._usage = {'files': 0, 'bytes': 0}
+        self._thread = None
+        self._wakeup = threading.Event()
+        self.stats = {'writes': 0, 'expired': 0, 'evicted': 0, 'sweeps': 0}
+
+    def session(self, session_id=None):
+        """Returns a sink that writes into one session's directory."""
+        return SessionArtifacts(self, session_id)
+
+    def _path(self, session_id, request_id, kind, compressed):
+        name = f"{safe_name(request_id)}-{safe_name(kind)}.json" + ('.gz' if compressed else '')
+        return os.path.join(self.directory, safe_name(session_id or DEFAULT_SESSION), name)
+
+    def write(self, session_id, request_id, kind, data):
+        path = self._path(session_id, request_id, kind, self.compress)
+        payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        if self.compress:
+            payload = gzip.compress(payload)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        for attempt in range(2):
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                break
+            except FileNotFoundError:
+                # The sweeper removed the empty session directory in between; create it again.
+                if attempt:
+                    raise
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.stats['writes'] += 1
+            self._written += len(payload)
+            over_budget = self._written > self.max_bytes // 10
+        if over_budget:
+            self._wakeup.set()
+        return path
+
+    def _scan(self):
+        """Yields ``(modified_at, size, path)`` for every file in the store."""
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield info.st_mtime, info.st_size, path
+
+    def sweep(self):
+        """Drops expired artifacts, then the oldest ones until under the size cap; returns what was removed."""
+        now = time.time()
+        files = sorted(self._scan())
+        expired, evicted, total = 0, 0, sum(size for _, size, _ in files)
+        kept = []
+        for modified_at, size, path in files:
+            # Temporary files of writes in progress are young; only abandoned ones ever expire.
+            if now - modified_at > self.ttl_seconds:
+                expired += self._remove(path)
+                total -= size
+            elif not path.endswith('.tmp'):
+                kept.append((size, path))
+        for size, path in kept:
+            if total <= self.max_bytes:
+                break
+            evicted += self._remove(path)
+            total -= size
+        for root, dirs, _ in os.walk(self.directory, topdown=False):
+            for name in dirs:
+                try:
+                    os.rmdir(os.path.join(root, name))
+                except OSError:
+                    pass
+        with self._lock:
+            self.stats['expired'] += expired
+            self.stats['evicted'] += evicted
+            self.stats['sweeps'] += 1
+            self._written = 0
+            self._usage = {'files': len(kept) - evicted, 'bytes': total}
+        return {'expired': expired, 'evicted': evicted, 'bytes': total}
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    def ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sweep_forever, name='artifact-sweeper', daemon=True)
+                self._thread.start()
+
+    def _sweep_forever(self):
+        while True:
+            try:
+                self.sweep()
+            except OSError as e:
+                print(f"An error occurred while sweeping the artifact store: {e}")
+            self._wakeup.wait(self.sweep_interval)
+            self._wakeup.clear()
+
+    def snapshot(self):
+        """The counters and the store's usage as of the last sweep."""
+        with self._lock:
+            return {**self.stats, **self._usage, 'written_since_sweep': self._written, 'max_bytes': self.max_bytes,
+                    'ttl_seconds': self.ttl_seconds}
+
+
+class SessionArtifacts:
+    """The artifact sink of one session, handed to the agent run contexts."""
+
+    def __init__(self, store, session_id=None):
+        self.store = store
+        self.session_id = session_id
+
+    def write(self, request_id, kind, data):
+        return self.store.write(self.session_id, request_id, kind, data)
+
+
+class AgentRunContext:
+    """Per-request run context; the function tools hand their parsed output back through it."""
+
+    def __init__(self, request_id=None, sink=None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.sink = sink
+        self.data = None
+        self.error = None
+        self.usage = {}
+
+    def accept(self, content, kind):
+        """Parses the json produced by a function tool and keeps it in memory."""
+        try:
+            with metrics.stage('json_parse', kind=kind):
+                # strict=False lets raw newlines and tabs inside strings through without
+                # re-decoding the text, which would mangle any non-ASCII characters.
+                data = json.loads(content, strict=False)
+                if isinstance(data, str):
+                    # The model sometimes passes the json double encoded.
+                    data = json.loads(data, strict=False)
+            if not isinstance(data, dict):
+                raise ValueError(f"expected a json object, got {type(data).__name__}")
+        except ValueError as e:
+            self.data = None
+            self.error = str(e)
+            metrics.inc('interview_tool_calls_total', kind=kind, outcome='invalid_json')
+            print(f"An error occurred while parsing the {kind} json: {e}")
+            return f"Invalid json: {e}"
+
+        metrics.inc('interview_tool_calls_total', kind=kind, outcome='accepted')
+        self.data = data
+        self.error = None
+        self.persist(kind)
+        return "The json was received successfully."
+
+    def accept_output(self, output, kind):
+        """Keeps the validated structured output of an agent run."""
+        self.data = output.model_dump()
+        self.error = None
+        self.persist(kind)
+
+    def persist(self, kind):
+        """Writes the current data to the sink, if the request asked for it."""
+        if self.sink is None:
+            return
+        try:
+            with metrics.stage('artifact_write', kind=kind):
+                self.sink.write(self.request_id, kind, self.data)
+        except OSError as e:
+            print(f"An error occurred while writing the {kind} artifact: {e}")
@@ -0,0 +1,245 @@
+"""ASGI entry point for the interview service.
+
+Serves the same routes as ``api.py`` but awaits the agent runs on the
+server's long-lived event loop instead of calling ``asyncio.run`` per request,
+so a single worker can keep many generations and evaluations in flight. The
+SQLite stores and disk caches block, so their calls run in worker threads.
+A run is cancelled when its request deadline passes or its client
+disconnects::
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import time
+
+from starlette.applications import Starlette
+from starlette.datastructures import Headers
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Match, Route
+
+from api import (FINISHED_STATES, JOB_VALIDATORS, MAX_JOB_WAIT_SECONDS, METRICS_CONTENT_TYPE, answer_session,
+                 artifact_store, assemble_test, batch_request_error, evaluate_answers, generate_question_set,
+                 generation_request_error, job_pool, job_status, job_store, prewarm_pool, run_housekeeping,
+                 service_stats, session_report, session_status, start_session, stream_batch_evaluation,
+                 stream_question_set, submit_job)
+from deadlines import DEADLINE_HEADER, current_deadline, request_deadline
+from engines import engine_warm_up
+from metrics import current_endpoint, metrics
+from wire import dumps, loads
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        return dumps(content)
+
+
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+async def read_json(request):
+    try:
+        return loads(await request.body())
+    except ValueError:
+        return None
+
+
+async def until_disconnected(request, coro):
+    """Awaits a handler coroutine, cancelling it when the client disconnects first."""
+    task = asyncio.ensure_future(coro)
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if not task.done() and await request.is_disconnected():
+                metrics.inc('interview_requests_cancelled_total', endpoint=current_endpoint.get(), reason='disconnect')
+                # Nobody reads this response; the status only shows up in the request metrics.
+                return {'error': 'Client disconnected'}, 499
+        return task.result()
+    finally:
+        task.cancel()
+
+
+async def generate_questions(request):
+    data = await read_json(request)
+    if not isinstance(data, dict):
+        return FastJSONResponse({'error': 'Request body must be a json object'}, status_code=400)
+    body, status = await until_disconnected(request, generate_question_set(data))
+    return FastJSONResponse(body, status_code=status)
+
+
+async def generate_questions_stream(request):
+    data = await read_json(request)
+    if not isinstance(data, dict):
+        return FastJSONResponse({'error': 'Request body must be a json object'}, status_code=400)
+    error = generation_request_error(data)
+    if error:
+        return FastJSONResponse(error, status_code=400)
+    return StreamingResponse(stream_question_set(data), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def assemble(request):
+    data = await read_json(request)
+    if not isinstance(data, dict):
+        return FastJSONResponse({'error': 'Request body must be a json object'}, status_code=400)
+    body, status = await until_disconnected(request, assemble_test(data))
+    return FastJSONResponse(body, status_code=status)
+
+
+async def evaluate(request):
+    data = await read_json(request)
+    if not isinstance(data, dict):
+        return FastJSONResponse({'error': 'Request body must be a json object'}, status_code=400)
+    body, status = await until_disconnected(request, evaluate_answers(data))
+    return FastJSONResponse(body, status_code=status)
+
+
+async def evaluate_batch(request):
+    data = await read_json(request)
+    if not isinstance(data, dict):
+        return FastJSONResponse({'error': 'Request body must be a json object'}, status_code=400)
+    error = batch_request_error(data)
+    if error:
+        return FastJSONResponse(error, status_code=400)
+    return StreamingResponse(stream_batch_evaluation(data), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def create_session(request):
+    data = await read_json(request)
+    if not isinstance(data, dict):
+        return FastJSONResponse({'error': 'Request body must be a json object'}, status_code=400)
+    body, status = await until_disconnected(request, start_session(data))
+    return FastJSONResponse(body, status_code=status)
+
+
+async def get_session(request):
+    body, status = await asyncio.to_thread(session_status, request.path_params['session_id'])
+    return FastJSONResponse(body, status_code=status)
+
+
+async def answer(request):
+    data = await read_json(request)
+    body, status = await asyncio.to_thread(answer_session, request.path_params['session_id'], data)
+    return FastJSONResponse(body, status_code=status)
+
+
+async def report(request):
+    data = await read_json(request)
+    body, status = await until_disconnected(
+        request, session_report(request.path_params['session_id'], data if isinstance(data, dict) else {}))
+    return FastJSONResponse(body, status_code=status)
+
+
+async def create_job(request):
+    kind = request.path_params['kind']
+    if kind not in JOB_VALIDATORS:
+        return FastJSONResponse({'error': f"Unknown job kind '{kind}'"}, status_code=404)
+    data = await read_json(request)
+    body, status = await asyncio.to_thread(submit_job, kind, data)
+    return FastJSONResponse(body, status_code=status)
+
+
+async def jobs_metrics(request):
+    """Endpoint to report queue depth and job ages."""
+    return FastJSONResponse(await asyncio.to_thread(job_pool.metrics))
+
+
+async def get_job(request):
+    """Returns the job; ``?wait=<seconds>`` long-polls until it finished."""
+    try:
+        wait = min(float(request.query_params.get('wait', 0)), MAX_JOB_WAIT_SECONDS)
+    except ValueError:
+        wait = 0
+    deadline = time.monotonic() + wait
+    job = await asyncio.to_thread(job_store.get, request.path_params['job_id'])
+    while job is not None and job['status'] not in FINISHED_STATES and time.monotonic() < deadline:
+        await asyncio.sleep(0.5)
+        job = await asyncio.to_thread(job_store.get, request.path_params['job_id'])
+    if job is None:
+        return FastJSONResponse({'error': 'Job not found'}, status_code=404)
+    return FastJSONResponse(job_status(job))
+
+
+async def housekeeping(request):
+    """Endpoint to clean up files created during the interview process."""
+    return FastJSONResponse(await asyncio.to_thread(run_housekeeping))
+
+
+async def ready(request):
+    """Readiness probe; answers 503 until the engines are warmed up."""
+    return FastJSONResponse(engine_warm_up.snapshot(), status_code=200 if engine_warm_up.ready() else 503)
+
+
+async def stats(request):
+    """Endpoint to report cache hit/miss counters."""
+    return FastJSONResponse(await asyncio.to_thread(service_stats))
+
+
+async def prometheus_metrics(request):
+    """Endpoint to expose latency, token and error metrics in the Prometheus text format."""
+    return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+routes = [
+    Route('/generate-questions', generate_questions, methods=['POST']),
+    Route('/generate-questions/stream', generate_questions_stream, methods=['POST']),
+    Route('/assemble-test', assemble, methods=['POST']),
+    Route('/evaluate', evaluate, methods=['POST']),
+    Route('/evaluate/batch', evaluate_batch, methods=['POST']),
+    Route('/sessions', create_session, methods=['POST']),
+    Route('/sessions/{session_id}', get_session, methods=['GET']),
+    Route('/sessions/{session_id}/answers', answer, methods=['POST']),
+    Route('/sessions/{session_id}/report', report, methods=['POST']),
+    Route('/jobs/metrics', jobs_metrics, methods=['GET']),
+    Route('/jobs/{kind}', create_job, methods=['POST']),
+    Route('/jobs/{job_id}', get_job, methods=['GET']),
+    Route('/housekeeping', housekeeping, methods=['GET']),
+    Route('/ready', ready, methods=['GET']),
+    Route('/stats', stats, methods=['GET']),
+    Route('/metrics', prometheus_metrics, methods=['GET']),
+]
+
+
+class RequestMetricsMiddleware:
+    """Records latency and status per route template, and labels the stages run while handling it."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        endpoint = next((route.path for route in routes if route.matches(scope)[0] == Match.FULL), 'unmatched')
+        current_endpoint.set(endpoint)
+        current_deadline.set(request_deadline(endpoint, Headers(scope=scope).get(DEADLINE_HEADER)))
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                            endpoint=endpoint, method=scope['method'])
+            metrics.inc('http_requests_total', endpoint=endpoint, method=scope['method'], status=status)
+
+
+app = Starlette(
+    routes=routes,
+    on_startup=[job_pool.ensure_started, prewarm_pool.ensure_started, artifact_store.ensure_started,
+                engine_warm_up.ensure_started],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+                Middleware(RequestMetricsMiddleware)],
+)
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="127.0.0.1", port=5000)
@@ -0,0 +1,456 @@
+"""Pluggable model backend for the agents.
+
+``LLM_BACKEND`` selects how the agents reach a model:
+
+* ``live`` (default) calls OpenAI as usual.
+* ``record`` calls OpenAI and appends every model response, tool calls
+  included, to the ``LLM_CASSETTE`` JSON-lines file.
+* ``replay`` serves the responses from the cassette without any network
+  access, after a synthetic latency of ``LLM_REPLAY_LATENCY_MS`` plus or minus
+  ``LLM_REPLAY_JITTER_MS``, plus ``LLM_REPLAY_MS_PER_TOKEN`` per output token.
+
+A replayed request is matched on its exact prompt first and then, round
+robin, on any response recorded for the same agent and turn, so benchmark
+bodies do not have to match the recording. With ``LLM_REPLAY_ON_MISS=synthetic``
+(the default) a request nothing was recorded for gets a generated stand-in
+response; ``error`` raises instead.
+
+Everything here builds on the agents and OpenAI SDKs, so the module is only
+imported once the first run config is built.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+
+from agents import RunConfig
+from agents.items import ModelResponse
+from agents.models.interface import Model, ModelProvider
+from agents.models.openai_provider import OpenAIProvider
+from agents.usage import Usage
+from openai.types.responses import (Response, ResponseCompletedEvent, ResponseOutputItem, ResponseTextDeltaEvent,
+                                    ResponseUsage)
+from openai.types.responses.response_usage import InputTokensDetails, OutputTokensDetails
+from pydantic import TypeAdapter
+
+from scheduler import (backoff_delay, current_priority, estimate_tokens, retryable_errors, run_with_backoff, time_for,
+                       usage_tokens)
+from tracing import TRACE_INCLUDE_SENSITIVE_DATA, configure_tracing
+
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'live')
+LLM_CASSETTE = os.getenv('LLM_CASSETTE', 'cassettes/llm.jsonl')
+LLM_REPLAY_LATENCY_MS = float(os.getenv('LLM_REPLAY_LATENCY_MS', '0'))
+LLM_REPLAY_JITTER_MS = float(os.getenv('LLM_REPLAY_JITTER_MS', '0'))
+# Added per output token of the replayed response, so long generations take longer like they do live.
+LLM_REPLAY_MS_PER_TOKEN = float(os.getenv('LLM_REPLAY_MS_PER_TOKEN', '0'))
+LLM_REPLAY_ON_MISS = os.getenv('LLM_REPLAY_ON_MISS', 'synthetic')
+
+BACKENDS = ('live', 'record', 'replay')
+
+STREAM_CHUNK_CHARS = 64
+
+output_items = TypeAdapter(list[ResponseOutputItem])
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+def request_key(model_name, system_instructions, input, tools, output_schema):
+    """Identifies one model call by everything that is sent to the model."""
+    schema = None if output_schema is None or output_schema.is_plain_text() else output_schema.name()
+    return _digest([model_name, system_instructions, input, sorted(tool.name for tool in tools), schema])
+
+
+def prompt_key(model_name, system_instructions, tools):
+    """Identifies the agent a call was made for, regardless of the user message."""
+    return _digest([model_name, system_instructions, sorted(tool.name for tool in tools)])
+
+
+def turn_of(input):
+    """``tool_result`` for the turn after a tool call, ``initial`` otherwise."""
+    if isinstance(input, list) and any(isinstance(item, dict) and item.get('type') == 'function_call_output'
+                                       for item in input):
+        return 'tool_result'
+    return 'initial'
+
+
+def encode_response(output, usage):
+    """Serializes a model turn; ``usage`` is either the SDK's Usage or the API's ResponseUsage."""
+    return {
+        'output': [item.model_dump(mode='json', exclude_none=True) for item in output],
+        'usage': {
+            'input_tokens': usage.input_tokens if usage else 0,
+            'cached_input_tokens': usage.input_tokens_details.cached_tokens if usage and usage.input_tokens_details else 0,
+            'output_tokens': usage.output_tokens if usage else 0,
+            'reasoning_tokens': usage.output_tokens_details.reasoning_tokens if usage and usage.output_tokens_details else 0,
+        },
+    }
+
+
+def decode_usage(usage):
+    return Usage(
+        requests=1,
+        input_tokens=usage['input_tokens'],
+        input_tokens_details=InputTokensDetails(cached_tokens=usage.get('cached_input_tokens', 0)),
+        output_tokens=usage['output_tokens'],
+        output_tokens_details=OutputTokensDetails(reasoning_tokens=usage.get('reasoning_tokens', 0)),
+        total_tokens=usage['input_tokens'] + usage['output_tokens'])
+
+
+class Cassette:
+    """Recorded model responses in a JSON-lines file, one call per line."""
+
+    def __init__(self, path=LLM_CASSETTE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._by_prompt = {}
+        self._cursors = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def _index(self, record):
+        self._exact[record['key']] = record
+        self._by_prompt.setdefault((record['prompt'], record['turn']), []).append(record)
+
+    def __len__(self):
+        return len(self._exact)
+
+    def find(self, key, prompt, turn):
+        record = self._exact.get(key)
+        if record is not None:
+            return record
+        candidates = self._by_prompt.get((prompt, turn))
+        if not candidates:
+            return None
+        with self._lock:
+            cursor = self._cursors.get((prompt, turn), 0)
+            self._cursors[(prompt, turn)] = cursor + 1
+        return candidates[cursor % len(candidates)]
+
+    def append(self, record):
+        with self._lock:
+            self._index(record)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class RecordingModel(Model):
+    """Calls the live model and appends each response to the cassette."""
+
+    def __init__(self, model_name, inner, cassette):
+        self.model_name = model_name
+        self.inner = inner
+        self.cassette = cassette
+
+    def _record(self, system_instructions, input, tools, output_schema, encoded):
+        self.cassette.append({
+            'key': request_key(self.model_name, system_instructions, input, tools, output_schema),
+            'prompt': prompt_key(self.model_name, system_instructions, tools),
+            'turn': turn_of(input),
+            'model': self.model_name,
+            'recorded_at': time.time(),
+            **encoded,
+        })
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs,
+                           tracing, *, previous_response_id):
+        response = await self.inner.get_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+            previous_response_id=previous_response_id)
+        self._record(system_instructions, input, tools, output_schema, encode_response(response.output, response.usage))
+        return response
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs,
+                              tracing, *, previous_response_id):
+        async for event in self.inner.stream_response(
+                system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                previous_response_id=previous_response_id):
+            if isinstance(event, ResponseCompletedEvent):
+                self._record(system_instructions, input, tools, output_schema,
+                             encode_response(event.response.output, event.response.usage))
+            yield event
+
+
+class ReplayModel(Model):
+    """Serves recorded (or synthetic) responses locally after a synthetic latency."""
+
+    def __init__(self, model_name, cassette, latency_ms=LLM_REPLAY_LATENCY_MS, jitter_ms=LLM_REPLAY_JITTER_MS,
+                 ms_per_token=LLM_REPLAY_MS_PER_TOKEN,
+                 on_miss=LLM_REPLAY_ON_MISS):
+        self.model_name = model_name
+        self.cassette = cassette
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ms_per_token = ms_per_token
+        self.on_miss = on_miss
+
+    async def _lookup(self, system_instructions, input, tools, output_schema, streaming=False):
+        record = self.cassette.find(request_key(self.model_name, system_instructions, input, tools, output_schema),
+                                    prompt_key(self.model_name, system_instructions, tools), turn_of(input))
+        if record is None:
+            if self.on_miss != 'synthetic':
+                raise LookupError(f"No recorded response for this {self.model_name} request in {self.cassette.path}")
+            record = synthetic_response(system_instructions, input, tools, output_schema)
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        # A streamed response pays for its output tokens as they arrive instead of up front.
+        if not streaming:
+            delay += self.ms_per_token * record['usage']['output_tokens']
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        return record
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs,
+                           tracing, *, previous_response_id):
+        record = await self._lookup(system_instructions, input, tools, output_schema)
+        return ModelResponse(output=output_items.validate_python(record['output']),
+                             usage=decode_usage(record['usage']), response_id=None)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs,
+                              tracing, *, previous_response_id):
+        record = await self._lookup(system_instructions, input, tools, output_schema, streaming=True)
+        output = output_items.validate_python(record['output'])
+        sequence_number = 0
+        for index, item in enumerate(output):
+            if item.type != 'message':
+                continue
+            for content_index, part in enumerate(item.content):
+                text = getattr(part, 'text', '')
+                for start in range(0, len(text), STREAM_CHUNK_CHARS):
+                    if self.ms_per_token > 0:
+                        await asyncio.sleep(self.ms_per_token * STREAM_CHUNK_CHARS / 4 / 1000)
+                    yield ResponseTextDeltaEvent(
+                        type='response.output_text.delta', item_id=item.id, output_index=index,
+                        content_index=content_index, delta=text[start:start + STREAM_CHUNK_CHARS],
+                        sequence_number=sequence_number)
+                    sequence_number += 1
+        usage = record['usage']
+        response = Response(
+            id=f"resp_{uuid.uuid4().hex}", created_at=time.time(), model=self.model_name, object='response',
+            output=output, parallel_tool_calls=False, tool_choice='auto', tools=[],
+            usage=ResponseUsage(
+                input_tokens=usage['input_tokens'], output_tokens=usage['output_tokens'],
+                total_tokens=usage['input_tokens'] + usage['output_tokens'],
+                input_tokens_details=InputTokensDetails(cached_tokens=usage.get('cached_input_tokens', 0)),
+                output_tokens_details=OutputTokensDetails(reasoning_tokens=usage.get('reasoning_tokens', 0))))
+        yield ResponseCompletedEvent(type='response.completed', response=response, sequence_number=sequence_number)
+
+
+SYNTHETIC_WORDS = (
+    'cache', 'lambda', 'queue', 'thread', 'lock', 'index', 'shard', 'replica', 'token', 'gateway', 'bucket',
+    'policy', 'role', 'subnet', 'cluster', 'container', 'pipeline', 'schema', 'migration', 'controller',
+    'middleware', 'delegate', 'interface', 'generic', 'closure', 'iterator', 'stream', 'buffer', 'socket',
+    'session', 'cookie', 'header', 'payload', 'endpoint', 'resolver', 'binding', 'handler', 'observer',
+    'factory', 'singleton', 'adapter', 'facade', 'decorator', 'repository', 'transaction', 'deadlock',
+    'timeout', 'retry', 'throttle', 'snapshot', 'partition', 'consumer', 'producer', 'topic', 'trigger',
+    'webhook', 'certificate', 'secret', 'vault', 'metric', 'tracer', 'profiler', 'allocator', 'collector',
+)
+
+
+def _user_text(input):
+    if isinstance(input, str):
+        return input
+    return "\n".join(item['content'] for item in input
+                     if isinstance(item, dict) and item.get('role') == 'user' and isinstance(item.get('content'), str))
+
+
+def synthetic_questions(seed, count):
+    """Distinct stand-in questions, deterministic for a given seed."""
+    rng = random.Random(seed)
+    questions = []
+    for i in range(count):
+        words = rng.sample(SYNTHETIC_WORDS, 12)
+        options = [" ".join(rng.sample(SYNTHETIC_WORDS, 3)) for _ in range(5)]
+        questions.append({
+            'question': f"Which change fixes {' '.join(words)}?",
+            'options': options,
+            'correct_options': [options[rng.randrange(5)]],
+            'difficulty': ('foundational', 'intermediate', 'advanced')[i % 3],
+            'tags': [words[0], words[1]],
+        })
+    return {'questions': questions}
+
+
+def synthetic_verdicts(user_text):
+    """Judges the sheet in an evaluator message at random, deterministically per question and answer."""
+    marker = 'Questions and answers json:\n'
+    correct, incorrect, correct_ids, incorrect_ids = [], [], [], []
+    if marker in user_text:
+        try:
+            sheet, _ = json.JSONDecoder().raw_decode(user_text, user_text.index(marker) + len(marker))
+        except ValueError:
+            sheet = {}
+        for question in sheet.get('questions', []) if isinstance(sheet, dict) else []:
+            answered = bool(question.get('answer'))
+            right = answered and int(_digest([question.get('question'), question.get('answer')])[:8], 16) % 3 != 0
+            (correct if right else incorrect).append(question.get('question'))
+            if question.get('id'):
+                (correct_ids if right else incorrect_ids).append(question['id'])
+    return correct, incorrect, correct_ids, incorrect_ids
+
+
+def synthetic_evaluation(narrative_only=False, user_text=''):
+    correct, incorrect, correct_ids, incorrect_ids = synthetic_verdicts(user_text)
+    evaluation = {
+        'strengths': 'Synthetic strengths.',
+        'correct_answers': correct,
+        'incorrect_answers': incorrect,
+        'correct_question_ids': correct_ids,
+        'incorrect_question_ids': incorrect_ids,
+        'technical_knowledge': 'Synthetic assessment of technical knowledge.',
+        'areas_of_improvement': 'Synthetic areas of improvement.',
+        'performance_rank': 3,
+    }
+    if narrative_only:
+        evaluation = {field: evaluation[field] for field in ('strengths', 'technical_knowledge', 'areas_of_improvement')}
+    return {'evaluation': evaluation}
+
+
+def synthetic_response(system_instructions, input, tools, output_schema=None):
+    """A plausible stand-in for the question setter or evaluator agents when nothing was recorded."""
+    user_text = _user_text(input)
+    match = re.search(r'create (\d+) questions', user_text)
+    count = int(match.group(1)) if match else 5
+    schema = None if output_schema is None or output_schema.is_plain_text() else output_schema.name()
+    if tools and turn_of(input) == 'initial':
+        tool = tools[0]
+        if 'evaluation' in tool.name:
+            payload = synthetic_evaluation(user_text=user_text)
+        else:
+            payload = synthetic_questions(_digest(user_text), count)
+        output = [{'type': 'function_call', 'id': f"fc_{uuid.uuid4().hex}", 'call_id': f"call_{uuid.uuid4().hex}",
+                   'name': tool.name, 'arguments': json.dumps({'content': json.dumps(payload)}),
+                   'status': 'completed'}]
+    else:
+        if schema is not None and 'Question' not in schema:
+            text = json.dumps(synthetic_evaluation('Narrative' in schema, user_text))
+        elif tools:
+            text = 'The json was submitted.'
+        else:
+            text = json.dumps(synthetic_questions(_digest(user_text), count))
+        output = [{'type': 'message', 'id': f"msg_{uuid.uuid4().hex}", 'role': 'assistant', 'status': 'completed',
+                   'content': [{'type': 'output_text', 'text': text, 'annotations': []}]}]
+    output_text = json.dumps(output)
+    return {'output': output, 'usage': {
+        'input_tokens': (len(system_instructions or '') + len(json.dumps(input, default=str))) // 4,
+        'cached_input_tokens': 0,
+        'output_tokens': len(output_text) // 4,
+        'reasoning_tokens': 0,
+    }}
+
+
+class PooledOpenAIProvider(ModelProvider):
+    """Resolves model names to OpenAI models that share the pooled client of the running loop."""
+
+    def __init__(self, clients):
+        self.clients = clients
+
+    def get_model(self, model_name):
+        return OpenAIProvider(openai_client=self.clients.client()).get_model(model_name)
+
+
+class ScheduledModel(Model):
+    """Draws every call of the wrapped model from the scheduler and retries transient failures."""
+
+    def __init__(self, inner, scheduler):
+        self.inner = inner
+        self.scheduler = scheduler
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs,
+                           tracing, *, previous_response_id):
+        estimate = estimate_tokens(system_instructions, input, model_settings)
+
+        async def call():
+            await self.scheduler.acquire(estimate, current_priority.get())
+            try:
+                response = await self.inner.get_response(
+                    system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                    previous_response_id=previous_response_id)
+            except retryable_errors() as e:
+                self.scheduler.failed(estimate, e)
+                raise
+            self.scheduler.settle(estimate, usage_tokens(response.usage))
+            return response
+
+        return await run_with_backoff(call, self.scheduler.max_retries)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs,
+                              tracing, *, previous_response_id):
+        estimate = estimate_tokens(system_instructions, input, model_settings)
+        attempt = 0
+        while True:
+            await self.scheduler.acquire(estimate, current_priority.get())
+            streamed = False
+            try:
+                async for event in self.inner.stream_response(
+                        system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                        previous_response_id=previous_response_id):
+                    streamed = True
+                    if isinstance(event, ResponseCompletedEvent):
+                        self.scheduler.settle(estimate, usage_tokens(event.response.usage))
+                    yield event
+                return
+            except retryable_errors() as e:
+                self.scheduler.failed(estimate, e)
+                attempt += 1
+                # Events already sent on cannot be taken back, so only a stream that failed up front is retried.
+                if streamed or attempt > self.scheduler.max_retries:
+                    raise
+                delay = backoff_delay(attempt, e)
+                if not time_for(delay):
+                    raise
+                print(f"Upstream call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+class ScheduledModelProvider(ModelProvider):
+    def __init__(self, inner, scheduler):
+        self.inner = inner
+        self.scheduler = scheduler
+
+    def get_model(self, model_name):
+        return ScheduledModel(self.inner.get_model(model_name), self.scheduler)
+
+
+class BackendModelProvider(ModelProvider):
+    def __init__(self, mode, cassette, live):
+        self.mode = mode
+        self.cassette = cassette
+        self.live = live
+
+    def get_model(self, model_name):
+        if self.mode == 'record':
+            return RecordingModel(model_name, self.live.get_model(model_name), self.cassette)
+        return ReplayModel(model_name, self.cassette)
+
+
+def build_run_config(live_provider, scheduler=None, mode=LLM_BACKEND, cassette_path=LLM_CASSETTE):
+    """The ``RunConfig`` every agent run goes through, for the selected backend.
+
+    ``live_provider`` resolves the real models, for the live and record
+    backends. With a ``scheduler`` every model call, replayed ones included,
+    draws from its budgets.
+    """
+    if mode not in BACKENDS:
+        raise ValueError(f"LLM_BACKEND must be one of {', '.join(BACKENDS)}")
+    # Replayed runs never reach OpenAI, so their traces are not exported there either.
+    configure_tracing(offline=mode == 'replay')
+    if mode == 'live':
+        provider = live_provider
+    else:
+        provider = BackendModelProvider(mode, Cassette(cassette_path), live_provider)
+    if scheduler is not None:
+        provider = ScheduledModelProvider(provider, scheduler)
+    return RunConfig(model_provider=provider, trace_include_sensitive_data=TRACE_INCLUDE_SENSITIVE_DATA)
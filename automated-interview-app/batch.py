@@ -0,0 +1,38 @@
+import os
+
+BATCH_CONCURRENCY = int(os.getenv('BATCH_EVALUATION_CONCURRENCY', '8'))
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_EVALUATION_MAX_CONCURRENCY', '64'))
+
+
+def build_answer_sheet(question_set, answers):
+    """Pairs the shared questions with one candidate's answers, given in question order."""
+    questions = question_set.get('questions', [])
+    return {
+        'questions': [
+            dict(question, answer=answers[index] if index < len(answers) else None)
+            for index, question in enumerate(questions)
+        ]
+    }
+
+
+def summarize_batch(results, failures, elapsed):
+    """Aggregates the per-candidate reports of a batch."""
+    ranks = {}
+    percentages = []
+    for report in results:
+        evaluation = report.get('evaluation', {}) if isinstance(report, dict) else {}
+        rank = evaluation.get('performance_rank')
+        if rank is not None:
+            ranks[str(rank)] = ranks.get(str(rank), 0) + 1
+        score = evaluation.get('score')
+        if isinstance(score, dict) and 'percentage' in score:
+            percentages.append(score['percentage'])
+    return {
+        'candidates': len(results) + len(failures),
+        'succeeded': len(results),
+        'failed': len(failures),
+        'failures': failures,
+        'performance_rank_distribution': ranks,
+        'average_score_percentage': round(sum(percentages) / len(percentages), 2) if percentages else None,
+        'elapsed_seconds': round(elapsed, 3),
+    }
@@ -0,0 +1,284 @@
+"""Load benchmark for the interview API.
+
+Drives the endpoints of the Postman collection at a given concurrency and
+reports throughput and p50/p95/p99 latency per endpoint. Unless ``--url`` is
+given, the app runs in process against the replay model backend, so no
+network access or OpenAI key is needed::
+
+    python benchmark.py --requests 200 --concurrency 16
+    python benchmark.py --target asgi --latency-ms 800 --jitter-ms 300
+    LLM_CASSETTE=cassettes/llm.jsonl python benchmark.py --endpoints generate-questions
+    python benchmark.py --url http://127.0.0.1:5000
+
+``--startup N`` measures cold start instead: N fresh worker processes each
+import the app and serve one request, and the time from spawning the process
+to its first response is reported with the resident memory afterwards::
+
+    python benchmark.py --startup 5 --target asgi
+    python benchmark.py --startup 5 --warm-up
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+COLLECTION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'postman-collection',
+                               'automated interview app.postman_collection.json')
+
+
+def load_collection(path=COLLECTION_PATH):
+    """Returns ``{name: (method, path, body)}`` for every request in the Postman collection."""
+    with open(path, encoding='utf-8') as f:
+        collection = json.load(f)
+    endpoints = {}
+    for item in collection['item']:
+        request = item['request']
+        url = request['url']['raw'] if isinstance(request['url'], dict) else request['url']
+        path = '/' + url.split('://', 1)[-1].split('/', 1)[-1]
+        raw = (request.get('body') or {}).get('raw')
+        endpoints[item['name']] = (request['method'].upper(), path, json.loads(raw) if raw else None)
+    return endpoints
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(name, latencies, failures, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies) + failures
+    return {
+        'endpoint': name,
+        'requests': count,
+        'failures': failures,
+        'throughput_rps': round(count / elapsed, 2) if elapsed else None,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 1) if latencies else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+    }
+
+
+def bench_flask(app, method, path, body, total, concurrency):
+    """Runs the Flask app in process; every worker thread has its own test client."""
+    def one(_):
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        return time.perf_counter() - started, response.status_code < 400
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    return results, time.perf_counter() - started
+
+
+async def bench_http(transport_or_url, method, path, body, total, concurrency):
+    """Runs the requests through httpx, against the ASGI app in process or a server at a url."""
+    import httpx
+
+    if isinstance(transport_or_url, str):
+        client = httpx.AsyncClient(base_url=transport_or_url, timeout=None)
+    else:
+        client = httpx.AsyncClient(transport=transport_or_url, base_url='http://bench', timeout=None)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            return time.perf_counter() - started, response.status_code < 400
+
+    async with client:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one() for _ in range(total)))
+    return results, time.perf_counter() - started
+
+
+def configure_offline(args):
+    """Points the app at the replay backend and throwaway state before it is imported."""
+    state_dir = tempfile.mkdtemp(prefix='interview-bench-')
+    os.environ.setdefault('OPENAI_API_KEY', 'offline-benchmark')
+    os.environ['LLM_BACKEND'] = 'replay'
+    os.environ['LLM_REPLAY_LATENCY_MS'] = str(args.latency_ms)
+    os.environ['LLM_REPLAY_JITTER_MS'] = str(args.jitter_ms)
+    os.environ['LLM_REPLAY_MS_PER_TOKEN'] = str(args.ms_per_token)
+    # Pre-generated sets would hide the model latency the benchmark is meant to measure.
+    os.environ.setdefault('PREWARM_ENABLED', 'false')
+    for name, default in (('LLM_CASSETTE', 'cassette.jsonl'), ('QUESTION_CACHE_DIR', 'question_cache'),
+                          ('ANSWER_KEY_DIR', 'answer_keys'), ('ARTIFACT_DIR', 'artifacts'),
+                          ('JOB_DB_PATH', 'jobs.sqlite3'), ('QUESTION_BANK_PATH', 'question_bank.sqlite3'),
+                          ('QUESTION_INDEX_PATH', 'question_index.npz'), ('EVALUATION_CACHE_DIR', 'evaluation_cache'),
+                          ('ADAPTIVE_SESSION_DB_PATH', 'adaptive_sessions.sqlite3'), ('PREWARM_POOL_DIR', 'prewarm_pool'),
+                          ('PREWARM_DEMAND_PATH', 'prewarm_demand.json'),
+                          ('TRACE_LOG_PATH', 'traces.jsonl')):
+        os.environ.setdefault(name, os.path.join(state_dir, default))
+
+
+def resident_memory_mb():
+    """The process's resident set size, or its peak where /proc is not available."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def startup_worker(args, name, spawned_at):
+    """Runs in a fresh process: imports the app, serves one request and prints the timings as json."""
+    started = time.time()
+    configure_offline(args)
+    # The benchmark warms up explicitly with --warm-up, not behind the first request's back.
+    os.environ['ENGINE_WARM_UP'] = 'false'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    method, path, body = load_collection()[name]
+    if body is not None and path == '/generate-questions':
+        body = {**body, 'cache': 'bypass'}
+
+    imported = time.perf_counter()
+    if args.target == 'asgi':
+        import httpx
+        from asgi import app
+
+        runner = lambda: asyncio.run(bench_http(httpx.ASGITransport(app=app), method, path, body, 1, 1))
+    else:
+        from api import app
+
+        runner = lambda: bench_flask(app, method, path, body, 1, 1)
+    warmed = time.perf_counter()
+    imported_rss = resident_memory_mb()
+    if args.warm_up:
+        from engines import engine_warm_up
+
+        engine_warm_up.run()
+    requested = time.perf_counter()
+    [(latency, ok)], _ = runner()
+    print(json.dumps({
+        'interpreter_ms': round((started - spawned_at) * 1000, 1),
+        'import_ms': round((warmed - imported) * 1000, 1),
+        'warm_up_ms': round((requested - warmed) * 1000, 1),
+        'first_request_ms': round(latency * 1000, 1),
+        'time_to_first_request_ms': round((time.time() - spawned_at) * 1000, 1),
+        'import_rss_mb': imported_rss,
+        'rss_mb': resident_memory_mb(),
+        'ok': ok,
+    }))
+
+
+def bench_startup(args, name):
+    """Starts ``args.startup`` worker processes one after another and summarizes their cold starts."""
+    runs = []
+    for _ in range(args.startup):
+        command = [sys.executable, os.path.abspath(__file__), '--startup-worker', name, '--spawned-at', repr(time.time()),
+                   '--target', args.target, '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+                   '--ms-per-token', str(args.ms_per_token)] + (['--warm-up'] if args.warm_up else [])
+        completed = subprocess.run(command, capture_output=True, text=True, check=True)
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    report = {'endpoint': name, 'workers': len(runs), 'failures': sum(1 for run in runs if not run['ok'])}
+    for metric in ('interpreter_ms', 'import_ms', 'warm_up_ms', 'first_request_ms', 'time_to_first_request_ms',
+                   'import_rss_mb', 'rss_mb'):
+        report[metric] = round(statistics.median(run[metric] for run in runs), 1)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--endpoints', nargs='*', help='Postman request names; defaults to all of them')
+    parser.add_argument('--target', choices=('flask', 'asgi'), default='flask', help='in-process app to drive')
+    parser.add_argument('--url', help='benchmark a running server instead of an in-process app')
+    parser.add_argument('--latency-ms', type=float, default=0, help='synthetic model latency per call')
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--ms-per-token', type=float, default=0, help='synthetic model latency per output token')
+    parser.add_argument('--use-cache', action='store_true',
+                        help='let /generate-questions serve repeats from the question cache')
+    parser.add_argument('--json', action='store_true', help='print the results as json')
+    parser.add_argument('--startup', type=int, metavar='N',
+                        help='measure the cold start of N fresh worker processes instead of the load')
+    parser.add_argument('--warm-up', action='store_true',
+                        help='with --startup, warm the engines up before the first request')
+    parser.add_argument('--startup-worker', help=argparse.SUPPRESS)
+    parser.add_argument('--spawned-at', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.startup_worker:
+        startup_worker(args, args.startup_worker, args.spawned_at)
+        return
+
+    collection = load_collection()
+    names = args.endpoints or list(collection)
+    unknown = [name for name in names if name not in collection]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}; choose from {', '.join(collection)}")
+
+    if args.startup:
+        reports = [bench_startup(args, name) for name in names]
+        columns = ('endpoint', 'workers', 'failures', 'interpreter_ms', 'import_ms', 'warm_up_ms', 'first_request_ms',
+                   'time_to_first_request_ms', 'import_rss_mb', 'rss_mb')
+        print_reports(reports, columns, args.json)
+        return
+
+    if args.url is None:
+        configure_offline(args)
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from engines import engine_warm_up
+
+        # A served worker warms up at start-up; the load figures are for warm workers.
+        engine_warm_up.run()
+        if args.target == 'asgi':
+            import httpx
+            from asgi import app
+
+            runner = lambda method, path, body: asyncio.run(bench_http(
+                httpx.ASGITransport(app=app), method, path, body, args.requests, args.concurrency))
+        else:
+            from api import app
+
+            runner = lambda method, path, body: bench_flask(app, method, path, body, args.requests, args.concurrency)
+    else:
+        runner = lambda method, path, body: asyncio.run(bench_http(
+            args.url, method, path, body, args.requests, args.concurrency))
+
+    reports = []
+    for name in names:
+        method, path, body = collection[name]
+        if body is not None and path == '/generate-questions' and not args.use_cache:
+            body = {**body, 'cache': 'bypass'}
+        results, elapsed = runner(method, path, body)
+        latencies = [latency for latency, ok in results if ok]
+        reports.append(summarize(name, latencies, len(results) - len(latencies), elapsed))
+
+    columns = ('endpoint', 'requests', 'failures', 'throughput_rps', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms')
+    print_reports(reports, columns, args.json)
+
+
+def print_reports(reports, columns, as_json=False):
+    if as_json:
+        print(json.dumps(reports, indent=2))
+        return
+    widths = [max(16, len(column) + 2) for column in columns[1:]]
+    print(f"{'endpoint':<28}" + ''.join(f"{column:>{width}}" for column, width in zip(columns[1:], widths)))
+    for report in reports:
+        print(f"{report['endpoint']:<28}"
+              + ''.join(f"{str(report[column]):>{width}}" for column, width in zip(columns[1:], widths)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Per-request deadlines for agent runs.
+
+A request's time budget comes from the ``X-Request-Timeout`` header, in
+seconds, or else from its endpoint's default, and is capped at
+``REQUEST_DEADLINE_MAX_SECONDS``. The absolute deadline is kept in a context
+variable, so it follows the request into the agent runs, the model scheduler
+and the retry backoff. Once it passes, the handler's task is cancelled. That
+cancels the ``Runner.run`` calls under it and closes their upstream
+connections, so the model stops spending tokens on an answer nobody waits for.
+"""
+import asyncio
+from contextvars import ContextVar
+import functools
+import math
+import os
+import time
+
+from metrics import current_endpoint, metrics
+
+DEADLINE_HEADER = 'X-Request-Timeout'
+REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', '120'))
+REQUEST_DEADLINE_MAX_SECONDS = float(os.getenv('REQUEST_DEADLINE_MAX_SECONDS', '900'))
+
+# Streams hand out results while they run, so they get longer than a request answered all at once.
+ENDPOINT_DEADLINES = {
+    '/generate-questions/stream': float(os.getenv('STREAM_DEADLINE_SECONDS', '300')),
+    '/evaluate/batch': float(os.getenv('BATCH_DEADLINE_SECONDS', '900')),
+}
+
+# ``time.monotonic()`` by which the current request has to be answered; None means no deadline.
+current_deadline = ContextVar('current_deadline', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request cannot finish within its deadline."""
+
+
+def request_deadline(endpoint, header=None):
+    """The absolute deadline of a request to ``endpoint`` with the given header value.
+
+    A header that is not a finite, positive number of seconds is ignored.
+    """
+    budget = ENDPOINT_DEADLINES.get(endpoint, REQUEST_DEADLINE_SECONDS)
+    if header:
+        try:
+            requested = float(header)
+        except ValueError:
+            requested = None
+        if requested is not None and math.isfinite(requested) and requested > 0:
+            budget = requested
+    return time.monotonic() + min(max(budget, 0.0), REQUEST_DEADLINE_MAX_SECONDS)
+
+
+def remaining():
+    """Seconds left until the current deadline, or None without one."""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def within_deadline():
+    """An ``asyncio.timeout`` scope that ends at the current deadline; no limit without one."""
+    left = remaining()
+    return asyncio.timeout(None if left is None else max(left, 0.0))
+
+
+def deadline_bounded(handler):
+    """Decorates a request handler so it is cancelled at the deadline and answers 504."""
+    @functools.wraps(handler)
+    async def wrapper(*args):
+        try:
+            async with within_deadline():
+                return await handler(*args)
+        except TimeoutError:
+            metrics.inc('interview_requests_cancelled_total', endpoint=current_endpoint.get(), reason='deadline')
+            return {'error': 'The request deadline was exceeded'}, 504
+    return wrapper
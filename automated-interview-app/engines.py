@@ -0,0 +1,418 @@
+"""The question setter and evaluator engines, and the model plumbing they share.
+
+``api.py``, ``asgi.py``, the job workers and the command-line scripts
+``interviewer.py`` and ``evaluator.py`` all run the agents from here. The
+agents and OpenAI SDKs take most of a worker's start-up time, so they are
+imported on first use: by the first agent run or, ahead of traffic, by
+``engine_warm_up``, which loads them and builds the run config and the agent
+templates in a background thread.
+"""
+import asyncio
+import functools
+import os
+import threading
+import time
+
+from artifacts import AgentRunContext
+from evaluation_cache import extract_verdicts, merge_report
+from grading import question_id
+from metrics import current_endpoint, metrics
+from prompts import (EVALUATOR_PROMPT, NARRATIVE_PROMPT, QUESTION_SETTER_PROMPT, evaluator_message, merge_instruction,
+                     narrative_message, question_setter_message)
+from registry import AgentRegistry, OpenAIClientRegistry
+from scheduler import ModelScheduler
+from sharding import chunk_questions, merge_question_sets, plan_shards
+from streaming import IncrementalQuestionParser
+from token_usage import TokenUsageStats, add_usage, usage_to_dict
+from tracing import agent_trace
+
+DEFAULT_MODEL = 'gpt-4o-mini'
+
+DEFAULT_QUESTION_COUNT = 25
+
+SHARD_CONCURRENCY = int(os.getenv('GENERATION_SHARD_CONCURRENCY', '8'))
+
+# Sheets with more questions than this are evaluated map-reduce style in groups; 0 disables it.
+EVALUATION_CHUNK_SIZE = int(os.getenv('EVALUATION_CHUNK_SIZE', '15'))
+
+EVALUATION_CHUNK_CONCURRENCY = int(os.getenv('EVALUATION_CHUNK_CONCURRENCY', '8'))
+
+# 'structured' has the agents return schema-validated objects in one model turn;
+# 'tool' has them pass the json to a function tool, which costs a second turn.
+AGENT_OUTPUT_MODE = os.getenv('AGENT_OUTPUT_MODE', 'structured')
+
+# Load the SDKs and build the agents in the background once the server starts; off leaves it to the first request.
+ENGINE_WARM_UP = os.getenv('ENGINE_WARM_UP', 'true').lower() in ('1', 'true', 'yes')
+
+token_stats = TokenUsageStats()
+
+# Pooled keep-alive OpenAI clients and agent templates shared by every request in the process.
+openai_clients = OpenAIClientRegistry()
+
+agent_registry = AgentRegistry()
+
+# RPM/TPM budgets every model call draws from, with interactive requests served first.
+model_scheduler = ModelScheduler()
+
+_run_config_lock = threading.Lock()
+_run_config = None
+
+
+def model_run_config():
+    """The ``RunConfig`` of every agent run, built on first use.
+
+    Live OpenAI by default; LLM_BACKEND=record or replay captures or serves
+    the model responses locally. Building it installs the trace processors,
+    so callers get it before they open their run's trace.
+    """
+    global _run_config
+    if _run_config is None:
+        with _run_config_lock:
+            if _run_config is None:
+                from backend import PooledOpenAIProvider, build_run_config
+
+                _run_config = build_run_config(PooledOpenAIProvider(openai_clients), scheduler=model_scheduler)
+    return _run_config
+
+
+@functools.cache
+def questions_tool():
+    """The function tool the question setter passes its json to in the 'tool' output mode."""
+    from agents import RunContextWrapper, function_tool
+
+    @function_tool
+    def get_json(ctx: RunContextWrapper[AgentRunContext], content: str) -> str:
+        """Receives the prepared questions json."""
+        with metrics.stage('tool_call', tool='get_json'):
+            return ctx.context.accept(content, "questions")
+    return get_json
+
+
+@functools.cache
+def evaluation_tool():
+    """The function tool the evaluator passes its report to in the 'tool' output mode."""
+    from agents import RunContextWrapper, function_tool
+
+    @function_tool
+    def get_evaluationreport_json(ctx: RunContextWrapper[AgentRunContext], content: str) -> str:
+        """Receives the evaluation report json."""
+        with metrics.stage('tool_call', tool='get_evaluationreport_json'):
+            return ctx.context.accept(content, "evaluation")
+    return get_evaluationreport_json
+
+
+def record_usage(agent, context, result, time_to_first_token=None):
+    """Keeps the run's token counts on the request context, in the process-wide stats and in the metrics."""
+    usage = usage_to_dict(result.context_wrapper.usage)
+    context.usage = add_usage(context.usage, usage)
+    token_stats.record(agent.name, usage, time_to_first_token)
+    labels = {'agent': agent.name, 'model': agent.model, 'endpoint': current_endpoint.get()}
+    for kind in ('input_tokens', 'cached_input_tokens', 'output_tokens'):
+        metrics.inc('interview_tokens_total', usage[kind], kind=kind, **labels)
+    if time_to_first_token is not None:
+        metrics.observe('interview_time_to_first_token_seconds', time_to_first_token, **labels)
+
+
+class InterviewQuestionPreparer:
+    def __init__(self, jobdesc, criteria, model=DEFAULT_MODEL):
+        self.jobdesc = jobdesc
+        self.criteria = criteria
+        self.model = model
+
+    def create_interviewer_system_prompt(self):
+        """Creates the static system prompt for the interviewer agent."""
+        return QUESTION_SETTER_PROMPT
+
+    def create_request_message(self, message, question_count=DEFAULT_QUESTION_COUNT, focus=None):
+        """Creates the user message carrying the role and the request specifics."""
+        minutes = max(5, round(question_count * 30 / DEFAULT_QUESTION_COUNT))
+        return question_setter_message(self.jobdesc, self.criteria, message, question_count, minutes, focus)
+
+    def create_agent(self, streaming=False):
+        """Returns the shared question setter agent for the configured output mode."""
+        if AGENT_OUTPUT_MODE == 'structured':
+            from schemas import QuestionSet
+
+            return agent_registry.get('Question Setter Agent', self.create_interviewer_system_prompt(), self.model,
+                                      output_type=QuestionSet)
+        tools = [] if streaming else [questions_tool()]
+        return agent_registry.get('Question Setter Agent', self.create_interviewer_system_prompt(), self.model, tools)
+
+    async def execute_agent(self, message, context=None, question_count=DEFAULT_QUESTION_COUNT, focus=None):
+        """Executes the agent to prepare interview questions.
+
+        Returns the run context; the parsed questions are in ``context.data``.
+        """
+        from agents import ModelBehaviorError, Runner
+
+        context = context or AgentRunContext()
+        with metrics.stage('agent_construction', self.model):
+            evaluator_agent = self.create_agent()
+            run_config = model_run_config()
+
+        stage = 'Question generation shard' if focus else 'Question generation'
+        with agent_trace(stage, context.request_id, model=self.model, focus=focus), \
+                metrics.stage('model_run', self.model, agent=evaluator_agent.name):
+            try:
+                result = await Runner.run(
+                    evaluator_agent, self.create_request_message(message, question_count, focus), context=context,
+                    run_config=run_config)
+            except ModelBehaviorError as e:
+                context.error = str(e)
+                print(f"An error occurred while validating the questions: {e}")
+                return context
+        if AGENT_OUTPUT_MODE == 'structured':
+            context.accept_output(result.final_output, "questions")
+        record_usage(evaluator_agent, context, result)
+        return context
+
+    async def execute_sharded_agent(self, message, context=None, question_count=DEFAULT_QUESTION_COUNT,
+                                    shards=3, topics=None, concurrency=SHARD_CONCURRENCY):
+        """Prepares the questions with several concurrent agent runs.
+
+        Each shard covers one topic or difficulty band; the results are merged,
+        de-duplicated and trimmed to ``question_count``.
+        """
+        context = context or AgentRunContext()
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run_shard(count, focus):
+            shard_message = f"{message}\nFor this part of the assessment, prepare exactly {count} questions focused on {focus}."
+            async with semaphore:
+                shard_context = AgentRunContext(request_id=context.request_id)
+                await self.execute_agent(shard_message, shard_context, question_count=count, focus=focus)
+            return shard_context
+
+        results = await asyncio.gather(
+            *(run_shard(count, focus) for count, focus in plan_shards(question_count, shards, topics)),
+            return_exceptions=True)
+        for result in results:
+            # A shard out of time fails the request instead of leaving a short set that would be cached.
+            if isinstance(result, TimeoutError):
+                raise result
+            if isinstance(result, Exception):
+                print(f"A question generation shard failed: {result}")
+        merged = merge_question_sets([r.data for r in results if isinstance(r, AgentRunContext) and r.data],
+                                     question_count)
+        for result in results:
+            if isinstance(result, AgentRunContext):
+                context.usage = add_usage(context.usage, result.usage)
+        context.data = merged if merged['questions'] else None
+        if context.data is not None:
+            context.persist('questions')
+        return context
+
+    async def stream_agent(self, message, context=None, question_count=DEFAULT_QUESTION_COUNT):
+        """Streams the agent's answer and yields each question as soon as it is complete.
+
+        The full question set is left in ``context.data`` once the stream ends.
+        """
+        from agents import Runner
+        from openai.types.responses import ResponseTextDeltaEvent
+        from schemas import QuestionSet
+
+        context = context or AgentRunContext()
+        streaming_agent = self.create_agent(streaming=True)
+        run_config = model_run_config()
+
+        parser = IncrementalQuestionParser()
+        started = time.perf_counter()
+        time_to_first_token = None
+        with agent_trace('Question generation stream', context.request_id, model=self.model), \
+                metrics.stage('model_stream', self.model, agent=streaming_agent.name):
+            result = Runner.run_streamed(
+                streaming_agent, self.create_request_message(message, question_count), context=context,
+                run_config=run_config)
+            async for event in result.stream_events():
+                if event.type == 'raw_response_event' and isinstance(event.data, ResponseTextDeltaEvent):
+                    if time_to_first_token is None:
+                        time_to_first_token = time.perf_counter() - started
+                    for question in parser.feed(event.data.delta):
+                        yield question
+            # stream_events() ends quietly when its task is cancelled; the cancellation has to go on from here.
+            if asyncio.current_task().cancelling():
+                raise asyncio.CancelledError
+        if isinstance(result.final_output, QuestionSet):
+            context.accept_output(result.final_output, "questions")
+        else:
+            context.data = parser.result()
+        record_usage(streaming_agent, context, result, time_to_first_token)
+
+
+class InterviewEvaluator:
+    def __init__(self, jobdesc, criteria, interview_json, grading=None, model=DEFAULT_MODEL):
+        self.jobdesc = jobdesc
+        self.criteria = criteria
+        self.interview_json = interview_json
+        self.grading = grading
+        self.model = model
+
+    def get_evaluator_prompt(self):
+        """Creates the static system prompt for the evaluator agent."""
+        return NARRATIVE_PROMPT if self.grading else EVALUATOR_PROMPT
+
+    def agent_name(self):
+        """The narrative writer gets its own name, so its spans and token counts are kept apart from the judge's."""
+        return 'Narrative Agent' if self.grading else 'Evaluator Agent'
+
+    def create_request_message(self, message):
+        """Creates the user message carrying the role, the answer sheet or grading, and the instruction.
+
+        The role and the questions come before anything candidate specific, so
+        evaluations of the same test share their prompt prefix.
+        """
+        if self.grading:
+            return narrative_message(self.jobdesc, self.criteria, self.grading, message)
+        return evaluator_message(self.jobdesc, self.criteria, self.interview_json, message)
+
+    def create_agent(self):
+        """Returns the shared evaluator or narrative agent for the configured output mode."""
+        if AGENT_OUTPUT_MODE == 'structured':
+            from schemas import EvaluationReport, NarrativeReport
+
+            return agent_registry.get(self.agent_name(), self.get_evaluator_prompt(), self.model,
+                                      output_type=NarrativeReport if self.grading else EvaluationReport)
+        return agent_registry.get(self.agent_name(), self.get_evaluator_prompt(), self.model,
+                                  tools=[evaluation_tool()])
+
+    async def execute_evaluator_agent(self, message, context=None, stage=None):
+        """Executes the agent to evaluate the candidate's answers.
+
+        ``stage`` names the run's trace. Returns the run context; the parsed
+        report is in ``context.data``.
+        """
+        from agents import ModelBehaviorError, Runner
+
+        context = context or AgentRunContext()
+        with metrics.stage('agent_construction', self.model):
+            evaluator_agent = self.create_agent()
+            run_config = model_run_config()
+
+        stage = stage or ('Evaluation narrative' if self.grading else 'Answer evaluation')
+        with agent_trace(stage, context.request_id, model=self.model), \
+                metrics.stage('model_run', self.model, agent=evaluator_agent.name):
+            try:
+                result = await Runner.run(evaluator_agent, self.create_request_message(message), context=context,
+                                          run_config=run_config)
+            except ModelBehaviorError as e:
+                context.error = str(e)
+                print(f"An error occurred while validating the evaluation report: {e}")
+                return context
+        if AGENT_OUTPUT_MODE == 'structured':
+            context.accept_output(result.final_output, "evaluation")
+        record_usage(evaluator_agent, context, result)
+        return context
+
+    async def execute_chunked_evaluator_agent(self, message, context=None, chunk_size=EVALUATION_CHUNK_SIZE,
+                                              concurrency=EVALUATION_CHUNK_CONCURRENCY):
+        """Evaluates a long answer sheet map-reduce style.
+
+        Groups of questions are judged by concurrent agent runs, and questions
+        no group report accounted for get one more pass. A final narrative run
+        merges the partial assessments, while the correct and incorrect lists
+        and the rank are re-aggregated from the per-question verdicts. The
+        report always covers the whole sheet: when questions are still without
+        a verdict after the second pass, the evaluation fails instead.
+        """
+        context = context or AgentRunContext()
+        questions = self.interview_json.get('questions', [])
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run_chunk(chunk):
+            async with semaphore:
+                chunk_context = AgentRunContext(request_id=context.request_id)
+                await InterviewEvaluator(self.jobdesc, self.criteria, {'questions': chunk}, model=self.model) \
+                    .execute_evaluator_agent(message, chunk_context, stage='Evaluation chunk')
+            return chunk_context
+
+        partials, verdicts, pending = [], {}, questions
+        for _ in range(2):
+            chunks = chunk_questions(pending, chunk_size)
+            results = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks), return_exceptions=True)
+            for chunk, result in zip(chunks, results):
+                if isinstance(result, TimeoutError):
+                    raise result
+                if isinstance(result, Exception):
+                    print(f"An evaluation chunk failed: {result}")
+                    continue
+                context.usage = add_usage(context.usage, result.usage)
+                if result.data is not None:
+                    partials.append(result.data)
+                    verdicts.update(extract_verdicts(result.data, chunk))
+            pending = [q for q in pending if question_id(q) not in verdicts]
+            if not pending:
+                break
+        if pending:
+            context.error = f"{len(pending)} of {len(questions)} questions could not be judged"
+            print(f"An error occurred while evaluating the answer sheet in chunks: {context.error}")
+            return context
+
+        merged = merge_report(None, questions, verdicts)['evaluation']
+        grading = {**merged, 'score': {'correct': len(merged['correct_answers']), 'total': len(questions)}}
+        reduce_context = AgentRunContext(request_id=context.request_id)
+        await InterviewEvaluator(self.jobdesc, self.criteria, None, grading, model=self.model) \
+            .execute_evaluator_agent(merge_instruction(partials), reduce_context, stage='Evaluation merge')
+        context.usage = add_usage(context.usage, reduce_context.usage)
+        if reduce_context.data is None:
+            return context
+        context.data = merge_report(reduce_context.data, questions, verdicts)
+        context.data['chunked'] = {'chunks': len(chunk_questions(questions, chunk_size))}
+        context.persist('evaluation')
+        return context
+
+    async def evaluate(self, message, context, chunk_size=EVALUATION_CHUNK_SIZE):
+        """Runs the evaluator on the whole sheet, or in chunks when the sheet is longer than ``chunk_size``."""
+        if chunk_size and len(self.interview_json.get('questions', [])) > chunk_size:
+            return await self.execute_chunked_evaluator_agent(message, context, chunk_size)
+        return await self.execute_evaluator_agent(message, context)
+
+
+def warm_up():
+    """Does the one-off work of a worker's first agent run: imports the SDKs and builds the run config and agents."""
+    model_run_config()
+    preparer = InterviewQuestionPreparer(None, None)
+    preparer.create_agent()
+    preparer.create_agent(streaming=True)
+    InterviewEvaluator(None, None, None).create_agent()
+    InterviewEvaluator(None, None, None, grading={'score': None}).create_agent()
+
+
+class EngineWarmUp:
+    """Runs ``warm_up`` once in a daemon thread, so a new worker serves its first request at full speed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.state = 'cold'
+        self.seconds = None
+        self.error = None
+
+    def run(self):
+        self.state = 'warming'
+        started = time.perf_counter()
+        try:
+            warm_up()
+        except Exception as e:
+            self.state, self.error = 'failed', str(e)
+            print(f"An error occurred while warming up the engines: {e}")
+        else:
+            self.state = 'ready'
+        self.seconds = round(time.perf_counter() - started, 3)
+
+    def ensure_started(self):
+        if self._thread is not None or not ENGINE_WARM_UP:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='engine-warm-up', daemon=True)
+                self._thread.start()
+
+    def ready(self):
+        """True once warmed up, or when warming up is disabled and the first request pays for it."""
+        return self.state == 'ready' or not ENGINE_WARM_UP
+
+    def snapshot(self):
+        return {'enabled': ENGINE_WARM_UP, 'state': self.state, 'seconds': self.seconds, 'error': self.error}
+
+
+engine_warm_up = EngineWarmUp()
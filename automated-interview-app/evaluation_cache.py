@@ -0,0 +1,138 @@
+"""Memoized evaluation reports and incremental re-evaluation.
+
+Reports are kept in a ``QuestionSetCache`` (a memory LRU over a TTL and size
+bounded disk tier) under a canonical hash of the role, the questions, the
+answers and the model. Every entry also records the per-question verdicts,
+and the latest entry of each candidate's sheet is remembered, so when a
+candidate resubmits with a few answers changed only those questions have to
+be judged again.
+"""
+import json
+import os
+
+from grading import as_answer_list, performance_rank, question_id, question_set_id
+from question_cache import QuestionSetCache, make_cache_key, normalize_text
+
+EVALUATION_CACHE_DIR = os.getenv('EVALUATION_CACHE_DIR', '.evaluation_cache')
+EVALUATION_CACHE_TTL_SECONDS = int(os.getenv('EVALUATION_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+# Above this share of changed answers a full evaluation is cheaper to reason about than a merge.
+INCREMENTAL_MAX_CHANGED_RATIO = float(os.getenv('INCREMENTAL_MAX_CHANGED_RATIO', '0.5'))
+
+
+def canonical_answers(questions):
+    """Maps each question id to the candidate's normalized, order independent answer."""
+    return {question_id(q): sorted(as_answer_list(q.get('answer'))) for q in questions}
+
+
+def evaluation_key(jobdesc, criteria, questions, model):
+    answers = [[question_id(q), sorted(as_answer_list(q.get('answer')))] for q in questions]
+    return make_cache_key(jobdesc, criteria, json.dumps(answers, ensure_ascii=False), model, 'evaluation')
+
+
+def lineage_key(jobdesc, criteria, questions, model, candidate_id):
+    """Identifies one candidate's sheet for a question set across resubmissions."""
+    return make_cache_key(jobdesc, criteria, question_set_id(questions), model, candidate_id, 'lineage')
+
+
+def narrative_key(jobdesc, criteria, grading, model):
+    """The narrative only depends on which questions were answered correctly, not on the exact answers."""
+    outcome = [sorted(normalize_text(item['question']) for item in grading[field])
+               for field in ('correct_answers', 'incorrect_answers')]
+    return make_cache_key(jobdesc, criteria, json.dumps(outcome, ensure_ascii=False), model, 'narrative')
+
+
+def extract_verdicts(report, questions):
+    """Reads which questions the evaluator judged correct or incorrect.
+
+    The evaluator lists the ids of the questions it judged, which the sheet
+    it sees carries. Reports without ids, e.g. for a sheet sent as a json
+    string, are matched on the exact normalized text of each listed question.
+    A question listed as both, or not at all, gets no verdict.
+    """
+    evaluation = (report or {}).get('evaluation', {}) if isinstance(report, dict) else {}
+    if not isinstance(evaluation, dict):
+        return {}
+    by_id = {field: set(listed_ids(evaluation.get(f"{field}_question_ids")))
+             for field in ('correct', 'incorrect')}
+    by_text = {field: set(listed_texts(evaluation.get(f"{field}_answers")))
+               for field in ('correct', 'incorrect')}
+    verdicts = {}
+    for question in questions:
+        qid = question_id(question)
+        if by_id['correct'] or by_id['incorrect']:
+            correct, incorrect = qid in by_id['correct'], qid in by_id['incorrect']
+        else:
+            text = normalize_text(question.get('question')).casefold()
+            correct, incorrect = text in by_text['correct'], text in by_text['incorrect']
+        if correct != incorrect:
+            verdicts[qid] = correct
+    return verdicts
+
+
+def listed_ids(value):
+    return [str(item).strip() for item in value if str(item).strip()] if isinstance(value, list) else []
+
+
+def listed_texts(value):
+    """The normalized question texts of a report list, whose items are texts or ``{"question": ...}`` objects."""
+    if not isinstance(value, list):
+        return []
+    texts = [item.get('question') if isinstance(item, dict) else item for item in value]
+    return [normalize_text(text).casefold() for text in texts if isinstance(text, str) and text.strip()]
+
+
+def changed_questions(questions, previous):
+    """The questions whose answer differs from the previous sheet or whose verdict is unknown."""
+    answers, verdicts = previous['answers'], previous['verdicts']
+    changed = []
+    for question in questions:
+        qid = question_id(question)
+        if qid not in verdicts or answers.get(qid) != sorted(as_answer_list(question.get('answer'))):
+            changed.append(question)
+    return changed
+
+
+def merge_report(previous_report, questions, verdicts):
+    """Re-aggregates a report from per-question verdicts, keeping the previous narrative."""
+    evaluation = dict((previous_report or {}).get('evaluation', {}))
+    correct, incorrect, correct_ids, incorrect_ids = [], [], [], []
+    for question in questions:
+        qid = question_id(question)
+        entry = {'question': question.get('question'), 'answer': question.get('answer')}
+        (correct if verdicts[qid] else incorrect).append(entry)
+        (correct_ids if verdicts[qid] else incorrect_ids).append(qid)
+    total = len(correct) + len(incorrect)
+    evaluation.update(correct_answers=correct, incorrect_answers=incorrect, correct_question_ids=correct_ids,
+                      incorrect_question_ids=incorrect_ids,
+                      performance_rank=performance_rank(len(correct) / total if total else 0.0))
+    return {'evaluation': evaluation}
+
+
+class EvaluationCache:
+    """Evaluation reports with their verdicts, plus a pointer to each candidate's latest sheet."""
+
+    def __init__(self, store=None):
+        self.store = store or QuestionSetCache(directory=EVALUATION_CACHE_DIR, ttl_seconds=EVALUATION_CACHE_TTL_SECONDS)
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def put(self, key, report, questions, verdicts, lineage=None):
+        self.store.put(key, {'report': report, 'answers': canonical_answers(questions), 'verdicts': verdicts})
+        if lineage is not None:
+            self.store.put(lineage, {'key': key})
+
+    def previous(self, lineage):
+        """Returns the latest cached entry of a candidate's sheet, or None."""
+        pointer = self.store.get(lineage)
+        return self.store.get(pointer['key']) if pointer else None
+
+    def get_narrative(self, key):
+        entry = self.store.get(key)
+        return entry['narrative'] if entry else None
+
+    def put_narrative(self, key, narrative):
+        self.store.put(key, {'narrative': narrative})
+
+    def snapshot(self):
+        return self.store.snapshot()
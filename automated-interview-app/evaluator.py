@@ -1,96 +1,16 @@
-from dotenv import load_dotenv
-from openai import OpenAI
-from agents import Agent, Runner, trace, function_tool
-import json
-
-load_dotenv(override=True)
+"""Runs the evaluator agent from the command line.
 
-class InterviewEvaluator:
-    def __init__(self, jobdesc, criteria, interview_json):
-        self.jobdesc = jobdesc
-        self.criteria = criteria
-        self.interview_json = interview_json
-
-    def get_evaluator_prompt(self):
-        """Creates a system prompt for the evaluator agent."""
-        return f"""You are a technical interview evaluator. 
-                Your job is to evaluate the candidate's answers based on the job description {self.jobdesc} and criteria {self.criteria}.
-                You will be given a json string containing questions and answers of a candidate.
-                The json string will have the following structure:
-                {{
-                    "questions": [
-                        {{
-                            "question": "Question text here",
-                            "options": [
-                                "Option 1",
-                                "Option 2",
-                                "Option 3",
-                                "Option 4",
-                                "Option 5"
-                            ],
-                            "answer": "Candidate's answer here"
-                        }},
-                        # Add more questions here
-                    ]
-                }}
-                Make sure to evaluate all the answers provided by the candidate.
-                You must evaluate the candidate's answers and check if the candidate's answer matches with the correct option from the given options.
-                If the candidate's answer matches with the correct option, then consider it as a correct answer.
-                If the candidate's answer does not match with the correct option, then consider it as an incorrect answer.
-                You must provide a detailed evaluation report based on the candidate's correct and incorrect answers only.
-                You do not need to consider the depth of the candidate's answer.
-                Analyze the candidate's answers and provide:
-
-                - Strengths
-                - Correct Answers if any
-                - Incorrect Answers if any
-                - Areas of Improvement
-                - Technical Knowledge
-                - Rank the performance on the scale of 1 to 5 where 1 is for worst performance and 5 is for berst performance.
+The engine is shared with the API and lives in ``engines``; importing
+``InterviewEvaluator`` from here keeps working.
+"""
+import asyncio
+import json
 
-                Format your response as a detailed evaluation report in json format. 
-                The json format should have the following structure:
-                {{
-                    "evaluation": {{
-                        "strengths": "List of strengths",
-                        "correct_answers": "List of correct answers if any",
-                        "incorrect_answers": "List of incorrect answers if any",                        
-                        "technical_knowledge": "Evaluation of technical knowledge",
-                        "areas_of_improvement": "List of areas of improvement",
-                        "performance_rank": 1  # Rank from 1 to 5
-                    }}
-                }}
-                
-                Following is the json string containing questions and answers of a candidate:
-                {self.interview_json}
-                """   
-    
-    @function_tool
-    def get_evaluationreport_json(content: str, filename: str = "evaluation.json") -> dict:
-        try:
-            # Step 1: Remove escaped newlines
-            clean_string = content.encode('utf-8').decode('unicode_escape')
+from dotenv import load_dotenv
 
-            # Step 2: Convert to dictionary
-            data = json.loads(clean_string)
-            with open(filename, "w") as file:
-                    file.write(clean_string)       
-        except Exception as e:
-            print(f"An error occurred while writing to the file: {e}")
+load_dotenv(override=True)
 
-    async def execute_evaluator_agent(self, message):
-        """Executes the agent to prepare interview questions."""       
-        evaluator_agent = Agent(
-            name='Evaluator Agent',
-            instructions=self.get_evaluator_prompt(),
-            model='gpt-4o-mini',
-            tools=[self.get_evaluationreport_json])
-                        
-        with trace('Automated Technical Evaluation'):
-            result = await Runner.run(evaluator_agent, message)
-        return result         
-    
-import asyncio
+from engines import InterviewEvaluator
 
 if __name__ == "__main__":
     jobdesc = """My team needs an expert developer who has extensive knowledge on dot net programming and AWS concepts.
@@ -362,9 +282,8 @@ if __name__ == "__main__":
 
     """
     async def main():
-        evaluator = InterviewEvaluator(jobdesc, criteria, answer_json)
-        evaluation = await evaluator.execute_evaluator_agent(message)
-        # Assuming the response is in JSON format, you can parse it if needed
-        print(evaluation)
+        evaluator = InterviewEvaluator(jobdesc, criteria, json.loads(answer_json))
+        context = await evaluator.execute_evaluator_agent(message)
+        print(json.dumps(context.data, indent=2, ensure_ascii=False) if context.data else context.error)
 
     asyncio.run(main())
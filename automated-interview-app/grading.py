@@ -0,0 +1,146 @@
+import hashlib
+import json
+
+from sharding import question_fingerprint
+
+ANSWER_KEY_FIELDS = ("correct_options",)
+
+
+def normalize_option(value):
+    return " ".join(str(value).split()).casefold()
+
+
+def question_set_id(questions):
+    """Content-addressed id of a question set, computed from question and option text only.
+
+    Candidate answers and answer keys do not change the id, so the id of a
+    submitted answer sheet matches the id of the set it was generated from.
+    """
+    canonical = [
+        [question_fingerprint(q), [normalize_option(option) for option in q.get("options", [])]]
+        for q in questions
+    ]
+    payload = json.dumps(canonical, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def question_id(question):
+    """Content-addressed id of a single question."""
+    canonical = [question_fingerprint(question), [normalize_option(option) for option in question.get("options", [])]]
+    payload = json.dumps(canonical, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def option_id(index):
+    """Positional id of an option: ``a`` to ``z``, then ``o26``, ``o27``, ..."""
+    return chr(ord("a") + index) if index < 26 else f"o{index}"
+
+
+def option_ids(question):
+    return [option_id(index) for index in range(len(question.get("options", [])))]
+
+
+def public_question(question):
+    """Returns the question without its answer key, with its question and option ids."""
+    public = {k: v for k, v in question.items() if k not in ANSWER_KEY_FIELDS}
+    public["id"] = question_id(question)
+    public["option_ids"] = option_ids(question)
+    return public
+
+
+def public_question_set(data, set_id):
+    """Returns the candidate facing copy of a question set."""
+    return {"question_set_id": set_id, "questions": [public_question(q) for q in data.get("questions", [])]}
+
+
+def answer_key_matches(question):
+    """True when the question has an answer key and every correct option is one of its options."""
+    correct = question.get("correct_options")
+    if not isinstance(correct, list) or not correct:
+        return False
+    options = {normalize_option(option) for option in question.get("options", [])}
+    return all(normalize_option(option) in options for option in correct)
+
+
+def has_answer_key(data):
+    questions = data.get("questions", []) if isinstance(data, dict) else []
+    return bool(questions) and all(answer_key_matches(q) for q in questions)
+
+
+def drop_mismatched_keys(questions):
+    """Removes answer keys that name options the question does not have; returns the questions and how many.
+
+    A paraphrased key would mark every candidate wrong, so a set with such a
+    question is judged by the evaluator agent instead of graded locally.
+    """
+    checked, dropped = [], 0
+    for question in questions:
+        if question.get("correct_options") and not answer_key_matches(question):
+            question = {k: v for k, v in question.items() if k not in ANSWER_KEY_FIELDS}
+            dropped += 1
+        checked.append(question)
+    return checked, dropped
+
+
+def as_answer_list(answer):
+    if answer is None:
+        return []
+    if isinstance(answer, (list, tuple)):
+        return [normalize_option(a) for a in answer if str(a).strip()]
+    return [normalize_option(answer)] if str(answer).strip() else []
+
+
+def performance_rank(ratio):
+    """Maps a score ratio to the 1 to 5 scale used by the evaluation report."""
+    return max(1, min(5, 1 + int(ratio * 5)))
+
+
+def grade(answer_sheet, answer_key):
+    """Grades an answer sheet against a stored question set with an answer key.
+
+    Multi-correct questions only count as correct when exactly the correct
+    options were chosen. Returns None when the sheet does not belong to the key.
+    """
+    keys = {question_fingerprint(q): q for q in answer_key.get("questions", [])}
+    correct, incorrect, unanswered = [], [], []
+    for question in answer_sheet.get("questions", []):
+        keyed = keys.get(question_fingerprint(question))
+        if keyed is None:
+            return None
+        chosen = as_answer_list(question.get("answer"))
+        expected = {normalize_option(option) for option in keyed.get("correct_options", [])}
+        entry = {"question": question.get("question"), "answer": question.get("answer")}
+        if not chosen:
+            unanswered.append(entry)
+            incorrect.append({**entry, "correct_options": keyed.get("correct_options", [])})
+        elif set(chosen) == expected:
+            correct.append(entry)
+        else:
+            incorrect.append({**entry, "correct_options": keyed.get("correct_options", [])})
+
+    total = len(correct) + len(incorrect)
+    ratio = len(correct) / total if total else 0.0
+    return {
+        "correct_answers": correct,
+        "incorrect_answers": incorrect,
+        "unanswered": len(unanswered),
+        "score": {"correct": len(correct), "total": total, "percentage": round(ratio * 100, 2)},
+        "performance_rank": performance_rank(ratio),
+    }
+
+
+def graded_report(grading, narrative=None):
+    """Builds the evaluation report from a local grading and the agent's narrative."""
+    narrative = (narrative or {}).get("evaluation", {}) if isinstance(narrative, dict) else {}
+    return {
+        "evaluation": {
+            "strengths": narrative.get("strengths", ""),
+            "correct_answers": grading["correct_answers"],
+            "incorrect_answers": grading["incorrect_answers"],
+            "technical_knowledge": narrative.get("technical_knowledge", ""),
+            "areas_of_improvement": narrative.get("areas_of_improvement", ""),
+            "performance_rank": grading["performance_rank"],
+            "score": grading["score"],
+        },
+        "graded_locally": True,
+    }
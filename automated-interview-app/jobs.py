@@ -0,0 +1,248 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from metrics import current_endpoint
+from scheduler import current_priority
+
+JOB_DB_PATH = os.getenv('JOB_DB_PATH', 'jobs.sqlite3')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+# A running job whose worker has not sent a heartbeat for this long is taken to have died with it.
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '900'))
+JOB_HEARTBEAT_SECONDS = float(os.getenv('JOB_HEARTBEAT_SECONDS', '30'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    status_code INTEGER,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+FINISHED_STATES = ('succeeded', 'failed')
+
+
+class JobStore:
+    """SQLite backed job queue; survives restarts and can be shared by several processes."""
+
+    def __init__(self, path=JOB_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._finished = threading.Condition()
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            columns = {row['name'] for row in db.execute('PRAGMA table_info(jobs)')}
+            if 'heartbeat_at' not in columns:
+                db.execute('ALTER TABLE jobs ADD COLUMN heartbeat_at REAL')
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def submit(self, kind, payload):
+        job_id = uuid.uuid4().hex
+        self._connect().execute(
+            'INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, ?, ?)',
+            (job_id, kind, json.dumps(payload), 'queued', time.time()))
+        return job_id
+
+    def claim(self):
+        """Atomically moves the oldest runnable job to running and returns it, or None.
+
+        A running job's worker refreshes its heartbeat while the job runs, so
+        only jobs left behind by a worker that died, i.e. without a heartbeat
+        for JOB_STALE_SECONDS, are picked up again.
+        """
+        db = self._connect()
+        now = time.time()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Too many attempts', finished_at = ? "
+                "WHERE status = 'running' AND COALESCE(heartbeat_at, started_at) < ? AND attempts >= ?",
+                (now, now - JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS))
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' "
+                "OR (status = 'running' AND COALESCE(heartbeat_at, started_at) < ?) ORDER BY created_at LIMIT 1",
+                (now - JOB_STALE_SECONDS,)).fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (now, now, row['id']))
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return dict(row) if row is not None else None
+
+    def heartbeat(self, job_id):
+        """Marks a running job as still alive, so no other worker claims it."""
+        self._connect().execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                                (time.time(), job_id))
+
+    def finish(self, job_id, status, status_code=None, result=None, error=None):
+        self._connect().execute(
+            'UPDATE jobs SET status = ?, status_code = ?, result = ?, error = ?, finished_at = ? WHERE id = ?',
+            (status, status_code, json.dumps(result) if result is not None else None, error, time.time(), job_id))
+        with self._finished:
+            self._finished.notify_all()
+
+    def get(self, job_id):
+        row = self._connect().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def wait(self, job_id, timeout):
+        """Blocks until the job finished or the timeout passed; returns the job."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['status'] in FINISHED_STATES or remaining <= 0:
+                return job
+            with self._finished:
+                # Other processes finishing the job do not notify us, so poll as well.
+                self._finished.wait(min(remaining, 1.0))
+
+    def purge(self, older_than=JOB_RETENTION_SECONDS):
+        self._connect().execute(
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+            (time.time() - older_than,))
+
+    def metrics(self):
+        """Returns queue depth and job age figures for sizing the worker pool."""
+        db = self._connect()
+        now = time.time()
+        counts = {row['status']: row['count'] for row in
+                  db.execute('SELECT status, COUNT(*) AS count FROM jobs GROUP BY status')}
+        oldest = db.execute("SELECT MIN(created_at) AS oldest FROM jobs WHERE status = 'queued'").fetchone()['oldest']
+        recent = db.execute(
+            "SELECT AVG(started_at - created_at) AS wait, AVG(finished_at - started_at) AS run FROM "
+            "(SELECT * FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT 100)").fetchone()
+        return {
+            'queue_depth': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            'succeeded': counts.get('succeeded', 0),
+            'failed': counts.get('failed', 0),
+            'oldest_queued_age_seconds': round(now - oldest, 3) if oldest else 0.0,
+            'avg_queue_wait_seconds': round(recent['wait'], 3) if recent['wait'] is not None else None,
+            'avg_run_seconds': round(recent['run'], 3) if recent['run'] is not None else None,
+        }
+
+
+class JobWorkerPool:
+    """Background threads that claim jobs from the store and run their coroutine handlers.
+
+    ``handlers`` maps a job kind to a coroutine function taking the request
+    payload and returning ``(body, status_code)``.
+    """
+
+    def __init__(self, store, handlers, workers=JOB_WORKERS, poll_interval=1.0):
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.busy = 0
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, kind, payload):
+        self.ensure_started()
+        job_id = self.store.submit(kind, payload)
+        self._wakeup.set()
+        return job_id
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _work(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        last_purge = 0.0
+        try:
+            while not self._stopped.is_set():
+                job = self.store.claim()
+                if job is None:
+                    if time.monotonic() - last_purge > 3600:
+                        self.store.purge()
+                        last_purge = time.monotonic()
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+                    continue
+                self._run(loop, job)
+        finally:
+            loop.close()
+
+    def _run(self, loop, job):
+        with self._lock:
+            self.busy += 1
+        try:
+            handler = self.handlers[job['kind']]
+            current_endpoint.set(f"/jobs/{job['kind']}")
+            # Queued user work ranks above pre-generation, which only runs while no batch call waits.
+            current_priority.set('batch')
+            body, status_code = loop.run_until_complete(
+                self._with_heartbeat(job['id'], handler(json.loads(job['payload']))))
+            status = 'succeeded' if status_code < 400 else 'failed'
+            self.store.finish(job['id'], status, status_code, result=body)
+        except Exception as e:
+            print(f"An error occurred while running job {job['id']}: {e}")
+            self.store.finish(job['id'], 'failed', 500, error=str(e))
+        finally:
+            with self._lock:
+                self.busy -= 1
+
+    async def _with_heartbeat(self, job_id, run):
+        """Awaits the job's handler while refreshing its heartbeat every JOB_HEARTBEAT_SECONDS."""
+        task = asyncio.ensure_future(run)
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=JOB_HEARTBEAT_SECONDS)
+            if done:
+                return task.result()
+            self.store.heartbeat(job_id)
+
+    def metrics(self):
+        metrics = self.store.metrics()
+        metrics['workers'] = self.workers if self._threads else 0
+        metrics['busy_workers'] = self.busy
+        return metrics
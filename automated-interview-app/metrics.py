@@ -0,0 +1,157 @@
+"""In-process latency, token and error metrics with a Prometheus text exposition.
+
+Stages are timed with ``metrics.stage(...)``; the endpoint label comes from
+``current_endpoint``, which the HTTP layer sets per request so that agent
+and tool stages deep in the call stack are attributed to the right route.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import os
+import queue
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+current_endpoint = ContextVar('current_endpoint', default='none')
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+
+class ProfilingSink:
+    """Appends observations as JSON lines from a background thread, off the request path."""
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        threading.Thread(target=self._drain, name='profiling-sink', daemon=True).start()
+
+    def write(self, record):
+        self._queue.put(record)
+
+    def _drain(self):
+        while True:
+            records = [self._queue.get()]
+            while len(records) < 1000:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.writelines(json.dumps(record) + '\n' for record in records)
+            except OSError as e:
+                print(f"An error occurred while writing profiling records: {e}")
+
+
+class MetricsRegistry:
+    def __init__(self, profiling_path=None):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self.sink = ProfilingSink(profiling_path) if profiling_path else None
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+        if self.sink is not None:
+            self.sink.write({'ts': time.time(), 'metric': name, 'value': value, **labels})
+
+    @contextmanager
+    def stage(self, stage, model=None, **labels):
+        """Times a block as ``interview_stage_seconds`` and counts it as an error if it raises."""
+        labels = {'stage': stage, 'endpoint': current_endpoint.get(), **labels}
+        if model is not None:
+            labels['model'] = model
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.inc('interview_stage_errors_total', error=type(e).__name__, **labels)
+            raise
+        finally:
+            self.observe('interview_stage_seconds', time.perf_counter() - started, **labels)
+
+    def render(self):
+        """Renders all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (h.buckets, list(h.counts), h.count, h.sum))
+                                for key, h in self._histograms.items())
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), (buckets, counts, count, total) in histograms:
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+metrics = MetricsRegistry(os.getenv('PROFILE_LOG_PATH') or None)
+metrics.describe('http_request_duration_seconds', 'Time spent in the HTTP handler.')
+metrics.describe('http_requests_total', 'HTTP requests by endpoint and status.')
+metrics.describe('interview_stage_seconds', 'Latency of agent construction, model runs, tool calls and parsing.')
+metrics.describe('interview_stage_errors_total', 'Exceptions raised inside a stage.')
+metrics.describe('interview_tokens_total', 'Model tokens by agent, model and kind.')
+metrics.describe('interview_tool_calls_total', 'Function tool calls by output kind and outcome.')
+metrics.describe('interview_time_to_first_token_seconds', 'Time until the first streamed token of a model run.')
+metrics.describe('interview_near_duplicates_removed_total', 'Generated questions dropped as near duplicates, by dedupe mode.')
+metrics.describe('interview_answer_keys_rejected_total', 'Answer keys dropped for naming options their question lacks.')
+metrics.describe('interview_prewarm_generated_total', 'Question sets generated ahead of time for popular roles.')
+metrics.describe('interview_prewarm_served_total', 'Generation requests served from the pre-generation pool.')
+metrics.describe('interview_requests_cancelled_total', 'Agent runs cancelled by a passed deadline or a disconnected client.')
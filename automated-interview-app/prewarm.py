@@ -0,0 +1,212 @@
+"""Background pre-generation of question sets for frequently requested roles.
+
+Every generation request the question cache cannot answer counts towards
+the demand of its role, i.e. the job description, criteria, message and
+question count that shape the set, with exponential decay so last week's
+peak still ranks this week. A daemon
+thread keeps a bounded pool of fresh, not yet served sets for the most
+requested roles. It generates at background priority, only while the model
+scheduler has headroom, and within a rolling token budget. Requests take
+their set from the pool instead of waiting for a live agent run.
+"""
+import asyncio
+from collections import deque
+import json
+import os
+import threading
+import time
+
+from metrics import current_endpoint, metrics
+from question_cache import DEFAULT_TTL_SECONDS, QuestionSetCache
+from scheduler import current_priority
+
+PREWARM_ENABLED = os.getenv('PREWARM_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+PREWARM_POOL_DIR = os.getenv('PREWARM_POOL_DIR', '.prewarm_pool')
+PREWARM_DEMAND_PATH = os.getenv('PREWARM_DEMAND_PATH', '.prewarm_demand.json')
+# Matches the question cache's TTL, so pooled sets outlive the cached set that answers their role meanwhile.
+PREWARM_POOL_TTL_SECONDS = int(os.getenv('PREWARM_POOL_TTL_SECONDS', str(DEFAULT_TTL_SECONDS)))
+PREWARM_SETS_PER_ROLE = int(os.getenv('PREWARM_SETS_PER_ROLE', '3'))
+PREWARM_TOP_ROLES = int(os.getenv('PREWARM_TOP_ROLES', '10'))
+# A role is worth pre-generating for once its decayed request count reaches this.
+PREWARM_MIN_DEMAND = float(os.getenv('PREWARM_MIN_DEMAND', '3'))
+PREWARM_DEMAND_HALF_LIFE_SECONDS = float(os.getenv('PREWARM_DEMAND_HALF_LIFE_SECONDS', str(7 * 24 * 3600)))
+# Roles whose decayed demand falls below this are forgotten; a single request stays tracked for one half-life.
+PREWARM_DEMAND_FLOOR = float(os.getenv('PREWARM_DEMAND_FLOOR', '0.5'))
+# At most this many roles are tracked; the least requested go first.
+PREWARM_MAX_TRACKED_ROLES = int(os.getenv('PREWARM_MAX_TRACKED_ROLES', '1000'))
+PREWARM_TOKEN_BUDGET = int(os.getenv('PREWARM_TOKEN_BUDGET', '500000'))
+PREWARM_BUDGET_WINDOW_SECONDS = int(os.getenv('PREWARM_BUDGET_WINDOW_SECONDS', '3600'))
+# Share of the RPM and TPM budgets that must be free before background generation starts.
+PREWARM_IDLE_HEADROOM = float(os.getenv('PREWARM_IDLE_HEADROOM', '0.5'))
+PREWARM_INTERVAL_SECONDS = float(os.getenv('PREWARM_INTERVAL_SECONDS', '15'))
+
+class PrewarmPool:
+    """Demand tracking, the per-role pools of ready sets and the thread that refills them.
+
+    ``generate`` is a coroutine function taking a role's request and
+    returning ``(question_set, tokens_used)``; the set is None on failure.
+    """
+
+    def __init__(self, generate, scheduler, store=None, sets_per_role=PREWARM_SETS_PER_ROLE,
+                 top_roles=PREWARM_TOP_ROLES, token_budget=PREWARM_TOKEN_BUDGET, interval=PREWARM_INTERVAL_SECONDS,
+                 demand_path=PREWARM_DEMAND_PATH):
+        self.generate = generate
+        self.scheduler = scheduler
+        self.store = store or QuestionSetCache(directory=PREWARM_POOL_DIR, ttl_seconds=PREWARM_POOL_TTL_SECONDS)
+        self.sets_per_role = sets_per_role
+        self.top_roles = top_roles
+        self.token_budget = token_budget
+        self.interval = interval
+        self.demand_path = demand_path
+        self._lock = threading.Lock()
+        self._demand = load_demand(demand_path)
+        self._demand_dirty = False
+        self._spent = deque()
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self.stats = {'hits': 0, 'misses': 0, 'generated': 0, 'failed': 0, 'skipped_busy': 0,
+                      'skipped_budget': 0}
+
+    def record(self, key, request):
+        """Counts a request towards its role's demand."""
+        now = time.time()
+        with self._lock:
+            entry = self._demand.get(key)
+            score = decayed(entry, now) if entry else 0.0
+            self._demand[key] = {'score': score + 1, 'updated': now, 'request': request}
+            self._demand_dirty = True
+
+    def take(self, key):
+        """Returns a ready set for the role and removes it from the pool, or None."""
+        with self._lock:
+            pool = self.store.get(key)
+            if not pool or not pool.get('sets'):
+                self.stats['misses'] += 1
+                return None
+            ready = pool['sets'][0]
+            self.store.put(key, {**pool, 'sets': pool['sets'][1:]})
+            self.stats['hits'] += 1
+        metrics.inc('interview_prewarm_served_total')
+        self._wakeup.set()
+        return ready
+
+    def ready(self, key):
+        pool = self.store.get(key)
+        return len(pool.get('sets', [])) if pool else 0
+
+    def roles(self):
+        """The most requested roles above the demand threshold, most requested first."""
+        now = time.time()
+        with self._lock:
+            ranked = sorted(((decayed(entry, now), key, entry['request']) for key, entry in self._demand.items()),
+                            key=lambda item: item[0], reverse=True)
+        return [(key, request) for score, key, request in ranked[:self.top_roles] if score >= PREWARM_MIN_DEMAND]
+
+    def spent(self):
+        cutoff = time.monotonic() - PREWARM_BUDGET_WINDOW_SECONDS
+        with self._lock:
+            while self._spent and self._spent[0][0] < cutoff:
+                self._spent.popleft()
+            return sum(tokens for _, tokens in self._spent)
+
+    async def refill(self):
+        """Tops up the pools of the most requested roles, one set at a time, while allowed."""
+        for key, request in self.roles():
+            while self.ready(key) < self.sets_per_role:
+                if self.spent() >= self.token_budget:
+                    self.stats['skipped_budget'] += 1
+                    return
+                if not self.scheduler.idle(PREWARM_IDLE_HEADROOM):
+                    self.stats['skipped_busy'] += 1
+                    return
+                data, tokens = await self.generate(request)
+                with self._lock:
+                    self._spent.append((time.monotonic(), tokens))
+                if data is None:
+                    self.stats['failed'] += 1
+                    break
+                with self._lock:
+                    pool = self.store.get(key) or {}
+                    self.store.put(key, {'sets': pool.get('sets', []) + [data]})
+                    self.stats['generated'] += 1
+                metrics.inc('interview_prewarm_generated_total')
+
+    def ensure_started(self):
+        if self._thread is not None or not PREWARM_ENABLED:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name='prewarm', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _work(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        current_endpoint.set('/prewarm')
+        current_priority.set('background')
+        try:
+            while not self._stopped.is_set():
+                try:
+                    loop.run_until_complete(self.refill())
+                except Exception as e:
+                    print(f"An error occurred while pre-generating question sets: {e}")
+                self.save_demand()
+                self._wakeup.wait(self.interval)
+                self._wakeup.clear()
+        finally:
+            loop.close()
+
+    def prune(self, now=None):
+        """Forgets roles whose demand decayed below the floor, then the least requested over the cap."""
+        now = now or time.time()
+        with self._lock:
+            scores = {key: decayed(entry, now) for key, entry in self._demand.items()}
+            keep = sorted((key for key, score in scores.items() if score >= PREWARM_DEMAND_FLOOR),
+                          key=scores.get, reverse=True)[:PREWARM_MAX_TRACKED_ROLES]
+            if len(keep) < len(self._demand):
+                self._demand = {key: self._demand[key] for key in keep}
+                self._demand_dirty = True
+
+    def save_demand(self):
+        """Prunes the demand map and writes it to its own file, only when it changed since the last write."""
+        self.prune()
+        with self._lock:
+            if not self._demand_dirty:
+                return
+            demand = dict(self._demand)
+            self._demand_dirty = False
+        tmp_path = f"{self.demand_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(demand, f, ensure_ascii=False)
+            os.replace(tmp_path, self.demand_path)
+        except OSError as e:
+            print(f"An error occurred while saving the pre-generation demand: {e}")
+            with self._lock:
+                self._demand_dirty = True
+
+    def snapshot(self):
+        roles = self.roles()
+        with self._lock:
+            tracked = len(self._demand)
+        return {**self.stats, 'enabled': PREWARM_ENABLED and self._thread is not None,
+                'tracked_roles': tracked, 'roles': len(roles), 'ready_sets': sum(self.ready(key) for key, _ in roles),
+                'tokens_spent': self.spent(), 'token_budget': self.token_budget}
+
+
+def load_demand(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            demand = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return demand if isinstance(demand, dict) else {}
+
+
+def decayed(entry, now):
+    return entry['score'] * 0.5 ** ((now - entry['updated']) / PREWARM_DEMAND_HALF_LIFE_SECONDS)
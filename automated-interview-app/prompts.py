@@ -0,0 +1,186 @@
+"""Prompt templates for the question setter and evaluator agents.
+
+The system prompts are fully static and every per-request value (job
+description, criteria, question count, answer sheets) goes into the user
+message, in a fixed order from the most to the least shared. Requests for
+the same role therefore share the longest possible prompt prefix, which
+the provider's automatic prompt caching can reuse.
+"""
+import json
+
+from wire import compact_sheet
+
+QUESTION_SETTER_PROMPT = """You are a technical guru working for Cognizant Technology Solutions pvt Limited.
+        Your job is to prepare questions to interview prospective cadidates on their technical skills based on the job description given in the user message.
+        You must prepare questions based on the criteria given in the user message.
+        Make sure to prepare scenario based questions with multiple options for the candidate to choose from. All the questions must have multiple options to choose from.
+        There should be at least 5 options for each question.
+        Some of the questions may have multiple correct answers.
+        The questions should be designed to assess the candidate's problem-solving abilities and technical knowledge.
+        The questions should be relevant to the job description and criteria provided.
+        The questions should be challenging and should require the candidate to demonstrate their understanding of the concepts.
+        The questions should be scenario-based, allowing candidates to apply their knowledge in practical situations.
+        The questions should be designed to evaluate the candidate's ability to think critically and solve problems effectively.
+        The questions should be designed to assess the candidate's experience and expertise in the relevant technologies and methodologies.
+        The questions should be designed to assess the candidate's technical skills and knowledge relevant to the job role.
+        The questions should be varied in difficulty to ensure a comprehensive assessment of the candidate's abilities.
+        The questions should be designed to encourage candidates to explain their thought process and reasoning.
+        The questions should be designed to assess the candidate's ability to work under pressure and make decisions quickly.
+        The questions should be designed to assess the candidate's ability to communicate technical concepts effectively.
+        The questions should be designed to assess the candidate's ability to adapt to new technologies and methodologies.
+        The questions should be designed to assess the candidate's understanding of best practices in software development and engineering.
+        The questions should be designed to assess the candidate's familiarity with industry standards and practices.
+        The questions should be challenging and relevant to the job role and experience level.
+        The questions should be clear and concise, avoiding any ambiguity.
+        You must create exactly as many questions as the user message asks for, answerable by an expert candidate in the time it states.
+        You must return a json object with the following structure:
+        {
+            "questions": [
+                {
+                    "question": "Question text here",
+                    "options": [
+                        "Option 1",
+                        "Option 2",
+                        "Option 3",
+                        "Option 4",
+                        "Option 5"
+                    ],
+                    "correct_options": [
+                        "Option 2"
+                    ],
+                    "difficulty": "intermediate",
+                    "tags": [
+                        "Skill tag"
+                    ]
+                },
+                # Add more questions here
+            ]
+        }
+        correct_options must repeat the exact text of every correct option of the question; list all of them when more than one option is correct.
+        difficulty must be one of foundational, intermediate or advanced, and tags must list the one to three skills the question assesses, as short names such as "ASP.NET Core" or "AWS IAM".
+        Return only the json object without any additional text or explanation.
+        """
+
+EVALUATOR_PROMPT = """You are a technical interview evaluator.
+                Your job is to evaluate the candidate's answers based on the job description and criteria given in the user message.
+                The user message also contains a json string with the questions and the candidate's answers.
+                The options of each question are keyed by option id and the candidate's answer is a list of the chosen option ids.
+                The json string will have the following structure:
+                {
+                    "questions": [
+                        {
+                            "id": "Question id",
+                            "question": "Question text here",
+                            "options": {
+                                "a": "Option 1",
+                                "b": "Option 2",
+                                "c": "Option 3",
+                                "d": "Option 4",
+                                "e": "Option 5"
+                            },
+                            "answer": ["b"]
+                        },
+                        # Add more questions here
+                    ]
+                }
+                An answer that is not an option id is the candidate's own text.
+                When the questions carry no "answer", the candidate's answers are listed after the json string, in question order.
+                Make sure to evaluate all the answers provided by the candidate.
+                List the id of every question that has one under correct_question_ids or incorrect_question_ids, exactly as given.
+                You must evaluate the candidate's answers and check if the candidate's answer matches with the correct option from the given options.
+                If the candidate's answer matches with the correct option, then consider it as a correct answer.
+                If the candidate's answer does not match with the correct option, then consider it as an incorrect answer.
+                You must provide a detailed evaluation report based on the candidate's correct and incorrect answers only.
+                You do not need to consider the depth of the candidate's answer.
+                Analyze the candidate's answers and provide:
+
+                - Strengths
+                - Correct Answers if any
+                - Incorrect Answers if any
+                - Areas of Improvement
+                - Technical Knowledge
+                - Rank the performance on the scale of 1 to 5 where 1 is for worst performance and 5 is for berst performance.
+
+                Format your response as a detailed evaluation report in json format.
+                The json format should have the following structure:
+                {
+                    "evaluation": {
+                        "strengths": "List of strengths",
+                        "correct_answers": "List of correct answers if any",
+                        "incorrect_answers": "List of incorrect answers if any",
+                        "correct_question_ids": "List of the ids of the questions answered correctly",
+                        "incorrect_question_ids": "List of the ids of the questions answered incorrectly",
+                        "technical_knowledge": "Evaluation of technical knowledge",
+                        "areas_of_improvement": "List of areas of improvement",
+                        "performance_rank": 1  # Rank from 1 to 5
+                    }
+                }
+                """
+
+NARRATIVE_PROMPT = """You are a technical interview evaluator.
+                Your job is to write the narrative part of an evaluation report based on the job description and criteria given in the user message.
+                The candidate's answers have already been graded and the user message lists the questions answered correctly and incorrectly; you must not re-grade them.
+                Analyze the candidate's results and provide:
+
+                - Strengths
+                - Areas of Improvement
+                - Technical Knowledge
+
+                Format your response in json format.
+                The json format should have the following structure:
+                {
+                    "evaluation": {
+                        "strengths": "List of strengths",
+                        "technical_knowledge": "Evaluation of technical knowledge",
+                        "areas_of_improvement": "List of areas of improvement"
+                    }
+                }
+                """
+
+
+def role_section(jobdesc, criteria):
+    return f"Job description:\n{jobdesc}\n\nCriteria:\n{criteria}"
+
+
+def question_setter_message(jobdesc, criteria, message, question_count, minutes, focus=None):
+    """User message for the question setter; the role comes first because it is shared the most."""
+    parts = [
+        role_section(jobdesc, criteria),
+        f"You must create {question_count} questions which can be answered in {minutes} minutes by an expert candidate.",
+    ]
+    if focus:
+        parts.append(f"Focus this set on {focus}.")
+    parts.append(message)
+    return "\n\n".join(parts)
+
+
+def evaluator_message(jobdesc, criteria, interview_json, message):
+    """User message for the full evaluator: role, then the compact sheet, then the instruction."""
+    if not isinstance(interview_json, str):
+        interview_json = json.dumps(compact_sheet(interview_json.get('questions', [])), ensure_ascii=False,
+                                    separators=(',', ':'))
+    return "\n\n".join([role_section(jobdesc, criteria), f"Questions and answers json:\n{interview_json}", message])
+
+
+def merge_instruction(partial_reports):
+    """Instruction for the reduce step of a chunked evaluation: the partial assessments to merge."""
+    notes = [
+        {field: (report.get("evaluation") or {}).get(field, "")
+         for field in ("strengths", "technical_knowledge", "areas_of_improvement")}
+        for report in partial_reports
+    ]
+    return ("Write the narrative part of the evaluation report for the whole test by merging these assessments "
+            f"of groups of the candidate's answers into one:\n{json.dumps(notes, ensure_ascii=False)}")
+
+
+def narrative_message(jobdesc, criteria, grading, message):
+    """User message for the narrative-only evaluator of a locally graded sheet."""
+    correct = [item["question"] for item in grading["correct_answers"]]
+    incorrect = [item["question"] for item in grading["incorrect_answers"]]
+    return "\n\n".join([
+        role_section(jobdesc, criteria),
+        f"The candidate answered {grading['score']['correct']} out of {grading['score']['total']} questions correctly.",
+        f"Questions answered correctly:\n{json.dumps(correct, ensure_ascii=False)}",
+        f"Questions answered incorrectly:\n{json.dumps(incorrect, ensure_ascii=False)}",
+        message,
+    ])
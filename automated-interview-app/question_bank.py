@@ -0,0 +1,160 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from grading import answer_key_matches, question_id
+from question_cache import make_cache_key
+
+QUESTION_BANK_PATH = os.getenv('QUESTION_BANK_PATH', 'question_bank.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    options TEXT NOT NULL,
+    correct_options TEXT NOT NULL,
+    difficulty TEXT,
+    source_hash TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS questions_difficulty ON questions (difficulty);
+CREATE INDEX IF NOT EXISTS questions_source ON questions (source_hash);
+CREATE TABLE IF NOT EXISTS question_tags (
+    question_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (question_id, tag)
+);
+CREATE INDEX IF NOT EXISTS question_tags_tag ON question_tags (tag, question_id);
+CREATE TABLE IF NOT EXISTS seen_questions (
+    candidate_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (candidate_id, question_id)
+);
+"""
+
+
+def source_hash(jobdesc, criteria):
+    """Identifies the job description a question was generated for."""
+    return make_cache_key(jobdesc, criteria)
+
+
+def normalize_tag(tag):
+    return " ".join(str(tag).split()).casefold()
+
+
+class QuestionBank:
+    """SQLite store of every generated question with its answer key, difficulty and skill tags."""
+
+    def __init__(self, path=QUESTION_BANK_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def add_questions(self, questions, jobdesc, criteria):
+        """Stores the questions that carry an answer key; returns their ids."""
+        db = self._connect()
+        source = source_hash(jobdesc, criteria)
+        now = time.time()
+        ids = []
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            for question in questions:
+                if not isinstance(question, dict) or not answer_key_matches(question):
+                    continue
+                qid = question_id(question)
+                db.execute(
+                    'INSERT OR IGNORE INTO questions (id, question, options, correct_options, difficulty, source_hash, '
+                    'created_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (qid, question.get('question', ''), json.dumps(question.get('options', [])),
+                     json.dumps(question['correct_options']), question.get('difficulty'), source, now))
+                db.executemany(
+                    'INSERT OR IGNORE INTO question_tags (question_id, tag) VALUES (?, ?)',
+                    [(qid, normalize_tag(tag)) for tag in question.get('tags', []) or [] if str(tag).strip()])
+                ids.append(qid)
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return ids
+
+    def sample(self, count, tags=None, difficulties=None, jobdesc=None, criteria=None, candidate_id=None, seed=None):
+        """Assembles up to ``count`` questions, stratified across (tag, difficulty).
+
+        Questions are filtered by any of ``tags`` or, without tags, by the job
+        description they were generated for, and questions the candidate has
+        already seen are excluded.
+        """
+        tags = [normalize_tag(tag) for tag in tags or []]
+        clauses, params = [], []
+        if tags:
+            clauses.append(f"q.id IN (SELECT question_id FROM question_tags WHERE tag IN ({','.join('?' * len(tags))}))")
+            params.extend(tags)
+        elif jobdesc is not None:
+            clauses.append('q.source_hash = ?')
+            params.append(source_hash(jobdesc, criteria))
+        if difficulties:
+            clauses.append(f"q.difficulty IN ({','.join('?' * len(difficulties))})")
+            params.extend(difficulties)
+        if candidate_id is not None:
+            clauses.append('q.id NOT IN (SELECT question_id FROM seen_questions WHERE candidate_id = ?)')
+            params.append(str(candidate_id))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._connect().execute(
+            f"SELECT q.*, (SELECT group_concat(tag, '\x1f') FROM question_tags t WHERE t.question_id = q.id) AS tags "
+            f"FROM questions q {where}", params).fetchall()
+
+        strata = {}
+        for row in rows:
+            row_tags = row['tags'].split('\x1f') if row['tags'] else []
+            primary = next((tag for tag in tags if tag in row_tags), row_tags[0] if row_tags else '')
+            strata.setdefault((primary, row['difficulty'] or ''), []).append(row)
+
+        rng = random.Random(seed)
+        buckets = list(strata.values())
+        for bucket in buckets:
+            rng.shuffle(bucket)
+        rng.shuffle(buckets)
+        picked = []
+        while len(picked) < count and any(buckets):
+            for bucket in buckets:
+                if bucket and len(picked) < count:
+                    picked.append(bucket.pop())
+        return [self._as_question(row) for row in picked]
+
+    @staticmethod
+    def _as_question(row):
+        return {
+            'question': row['question'],
+            'options': json.loads(row['options']),
+            'correct_options': json.loads(row['correct_options']),
+            'difficulty': row['difficulty'],
+            'tags': row['tags'].split('\x1f') if row['tags'] else [],
+        }
+
+    def mark_seen(self, candidate_id, questions):
+        now = time.time()
+        self._connect().executemany(
+            'INSERT OR IGNORE INTO seen_questions (candidate_id, question_id, seen_at) VALUES (?, ?, ?)',
+            [(str(candidate_id), question_id(q), now) for q in questions])
+
+    def stats(self):
+        db = self._connect()
+        return {
+            'questions': db.execute('SELECT COUNT(*) FROM questions').fetchone()[0],
+            'tags': db.execute('SELECT COUNT(DISTINCT tag) FROM question_tags').fetchone()[0],
+            'by_difficulty': {row[0] or 'unknown': row[1] for row in db.execute(
+                'SELECT difficulty, COUNT(*) FROM questions GROUP BY difficulty')},
+        }
@@ -0,0 +1,167 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.getenv("QUESTION_CACHE_DIR", ".question_cache")
+DEFAULT_MEMORY_ENTRIES = int(os.getenv("QUESTION_CACHE_MEMORY_ENTRIES", "256"))
+DEFAULT_TTL_SECONDS = int(os.getenv("QUESTION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+DEFAULT_MAX_DISK_BYTES = int(os.getenv("QUESTION_CACHE_MAX_DISK_BYTES", str(256 * 1024 * 1024)))
+# The disk tier is swept for expired and surplus entries at most this often, not on every write.
+DEFAULT_SWEEP_SECONDS = float(os.getenv("QUESTION_CACHE_SWEEP_SECONDS", "60"))
+
+
+def normalize_text(value):
+    """Collapses whitespace so cosmetic edits to a job description hit the same entry."""
+    return " ".join(str(value or "").split())
+
+
+def make_cache_key(*parts):
+    """Creates a content-addressed key from the normalized request fields."""
+    payload = json.dumps([normalize_text(part) for part in parts], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class QuestionSetCache:
+    """Two tier cache for generated question sets.
+
+    The memory tier is a bounded LRU, the disk tier keeps one json file per key
+    and is bounded by a TTL and a total size cap (oldest entries go first).
+    ``max_disk_bytes=None`` keeps entries until they expire, whatever the size.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, memory_entries=DEFAULT_MEMORY_ENTRIES,
+                 ttl_seconds=DEFAULT_TTL_SECONDS, max_disk_bytes=DEFAULT_MAX_DISK_BYTES,
+                 sweep_seconds=DEFAULT_SWEEP_SECONDS):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self.sweep_seconds = sweep_seconds
+        self._last_sweep = 0.0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key_for(self, jobdesc, criteria, message, model, *extra):
+        return make_cache_key(jobdesc, criteria, message, model, *extra)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _expired(self, stored_at):
+        return self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds
+
+    def get(self, key):
+        """Returns the cached question set for the key or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, data = entry
+                if not self._expired(stored_at):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return data
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if self._expired(stored_at):
+                os.remove(path)
+                data = None
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+
+        with self._lock:
+            if data is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember(key, stored_at, data)
+        return data
+
+    def put(self, key, data):
+        """Stores the question set in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, data)
+            self.stats["stores"] += 1
+
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"An error occurred while writing to the question cache: {e}")
+            return
+        if now - self._last_sweep >= self.sweep_seconds:
+            self._last_sweep = now
+            self.evict()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _remember(self, key, stored_at, data):
+        self._memory[key] = (stored_at, data)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def evict(self):
+        """Drops expired disk entries, then the oldest ones until under the size cap."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if self._expired(stat.st_mtime):
+                self._remove(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if self.max_disk_bytes is None:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self.stats["evictions"] += 1
+
+    def snapshot(self):
+        """Returns the hit/miss counters and current sizes."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,165 @@
+"""Process-wide OpenAI clients, agent templates and the event loop behind the Flask views.
+
+An httpx connection pool belongs to the event loop it was opened on, so the
+pooled ``AsyncOpenAI`` client is kept per loop: one for the background loop
+serving Flask, one per job worker and one for an ASGI server's loop. Each of
+them lives as long as the process and keeps its connections alive across
+requests. The agents, OpenAI and httpx packages are imported on first use.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import queue
+import threading
+import weakref
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '100'))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '50'))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY_SECONDS', '120'))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.getenv('OPENAI_CONNECT_TIMEOUT_SECONDS', '10'))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv('OPENAI_TIMEOUT_SECONDS', '300'))
+
+
+class OpenAIClientRegistry:
+    """One pooled, keep-alive ``AsyncOpenAI`` client per event loop."""
+
+    def __init__(self, max_connections=OPENAI_MAX_CONNECTIONS,
+                 max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                 keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self._lock = threading.Lock()
+        self._clients = weakref.WeakKeyDictionary()
+
+    def client(self):
+        """Returns the client of the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                import httpx
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+                limits = httpx.Limits(max_connections=self.max_connections,
+                                      max_keepalive_connections=self.max_keepalive_connections,
+                                      keepalive_expiry=self.keepalive_expiry)
+                timeout = httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS)
+                # The model scheduler does all the retrying, so every attempt draws from its RPM and TPM budgets.
+                client = self._clients[loop] = AsyncOpenAI(
+                    http_client=DefaultAsyncHttpxClient(limits=limits, timeout=timeout), max_retries=0)
+            return client
+
+    def __len__(self):
+        return len(self._clients)
+
+
+class AgentRegistry:
+    """Agents built once per name, instructions, model and tools, and shared by every run.
+
+    Runs never mutate an agent, so one template serves concurrent requests;
+    per-request differences are applied with a cheap shallow ``clone``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents = {}
+
+    def get(self, name, instructions, model, tools=(), output_type=None, **overrides):
+        key = (name, instructions, model, tuple(id(tool) for tool in tools), output_type)
+        agent = self._agents.get(key)
+        if agent is None:
+            with self._lock:
+                agent = self._agents.get(key)
+                if agent is None:
+                    from agents import Agent
+
+                    agent = self._agents[key] = Agent(name=name, instructions=instructions, model=model,
+                                                      tools=list(tools), output_type=output_type)
+        return agent.clone(**overrides) if overrides else agent
+
+    def __len__(self):
+        return len(self._agents)
+
+
+class BackgroundLoop:
+    """A long-lived event loop in a daemon thread, for running coroutines from synchronous code."""
+
+    def __init__(self, name='agent-loop'):
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop = None
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def submit(self, coro):
+        """Schedules a coroutine on the loop; returns a ``concurrent.futures.Future`` of its result.
+
+        The task runs in a copy of the caller's context, so context variables
+        set by the request (such as the metrics endpoint label) reach it.
+        """
+        future = concurrent.futures.Future()
+
+        def start():
+            task = asyncio.ensure_future(coro)
+
+            def finish(task):
+                if future.cancelled():
+                    return
+                if task.cancelled():
+                    future.cancel()
+                elif task.exception() is not None:
+                    future.set_exception(task.exception())
+                else:
+                    future.set_result(task.result())
+
+            task.add_done_callback(finish)
+            future.add_done_callback(lambda f: f.cancelled() and self.loop.call_soon_threadsafe(task.cancel))
+
+        self.loop.call_soon_threadsafe(start, context=contextvars.copy_context())
+        return future
+
+    def run(self, coro):
+        """Runs a coroutine on the loop and blocks until it returns."""
+        return self.submit(coro).result()
+
+    def iterate(self, agen):
+        """Drives an async generator on the loop and yields its items, e.g. for a Flask streaming response.
+
+        The generator runs as one task, so context variables it sets (such as
+        the agents SDK's current trace) hold for its whole lifetime. Closing
+        the returned generator, e.g. when the client disconnects, cancels it.
+        """
+        items = queue.SimpleQueue()
+        done = object()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put((True, item))
+            except Exception as e:
+                items.put((False, e))
+            finally:
+                items.put((True, done))
+                await agen.aclose()
+
+        future = self.submit(pump())
+        try:
+            while True:
+                ok, item = items.get()
+                if not ok:
+                    raise item
+                if item is done:
+                    break
+                yield item
+        finally:
+            future.cancel()
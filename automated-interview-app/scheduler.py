@@ -0,0 +1,296 @@
+"""Request coalescing and a central budget for upstream model calls.
+
+``SingleFlight`` lets identical in-flight requests share one execution.
+``ModelScheduler`` holds requests-per-minute and tokens-per-minute token
+buckets that every model call has to draw from, served in priority order;
+``backend.ScheduledModelProvider`` puts it in front of the agents' models and
+retries rate limits and transient errors with jittered backoff. Neither
+waits past the request deadline: a call that cannot start in time fails
+right away and leaves its place in the queue to calls that still can.
+"""
+import asyncio
+import concurrent.futures
+from contextvars import ContextVar
+import functools
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from deadlines import DeadlineExceeded, remaining
+from metrics import metrics
+
+MODEL_RPM_LIMIT = int(os.getenv('MODEL_RPM_LIMIT', '500'))
+MODEL_TPM_LIMIT = int(os.getenv('MODEL_TPM_LIMIT', '200000'))
+MODEL_MAX_RETRIES = int(os.getenv('MODEL_MAX_RETRIES', '6'))
+# Output tokens assumed for a call until its real usage is known.
+MODEL_OUTPUT_TOKEN_ESTIMATE = int(os.getenv('MODEL_OUTPUT_TOKEN_ESTIMATE', '2000'))
+
+PRIORITIES = ('interactive', 'batch', 'background')
+
+current_priority = ContextVar('current_priority', default='interactive')
+
+
+@functools.cache
+def retryable_errors():
+    """The OpenAI errors worth retrying; imported on first use so the SDK loads lazily."""
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+    return RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+
+
+def retry_after_seconds(error):
+    """Reads the provider's retry-after hint from a rate limit error, if there is one."""
+    response = getattr(error, 'response', None)
+    value = response.headers.get('retry-after') if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt, error, base_delay=1.0, max_delay=60.0):
+    """The provider's retry-after hint, or a full-jitter exponential delay."""
+    delay = retry_after_seconds(error)
+    return delay if delay is not None else random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+async def run_with_backoff(make_call, max_retries=MODEL_MAX_RETRIES, base_delay=1.0, max_delay=60.0):
+    """Awaits ``make_call()``, retrying rate limit and transient errors with jittered exponential backoff."""
+    attempt = 0
+    while True:
+        try:
+            return await make_call()
+        except retryable_errors() as e:
+            attempt += 1
+            if attempt > max_retries:
+                raise
+            delay = backoff_delay(attempt, e, base_delay, max_delay)
+            if not time_for(delay):
+                raise
+            print(f"Upstream call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def time_for(delay):
+    """True when waiting ``delay`` seconds still leaves time before the request deadline."""
+    left = remaining()
+    return left is None or delay < left
+
+
+def request_fingerprint(kind, data):
+    payload = json.dumps([kind, data], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class Flight:
+    """One shared execution: its task, the future its callers wait on and how many of them still wait."""
+
+    def __init__(self):
+        self.future = concurrent.futures.Future()
+        self.task = None
+        self.waiters = 1
+
+
+class SingleFlight:
+    """Shares one execution between identical concurrent calls, across threads and event loops.
+
+    The first caller starts the work as its own task; later callers with the
+    same key wait for that task's result. The work is shielded, so a caller
+    that goes away (e.g. a disconnected client or a passed deadline) does not
+    cancel it for the others; once no caller is left waiting it is cancelled.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.stats = {'leaders': 0, 'followers': 0, 'abandoned': 0}
+
+    async def do(self, key, make_call):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.stats['followers'] += 1
+                flight.waiters += 1
+            else:
+                flight = self._flights[key] = Flight()
+                self.stats['leaders'] += 1
+                flight.task = asyncio.ensure_future(make_call())
+                flight.task.add_done_callback(functools.partial(self._land, key, flight))
+        try:
+            return await asyncio.shield(asyncio.wrap_future(flight.future))
+        except asyncio.CancelledError:
+            self._leave(key, flight)
+            raise
+
+    def _leave(self, key, flight):
+        with self._lock:
+            flight.waiters -= 1
+            if flight.waiters > 0 or flight.task.done():
+                return
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            self.stats['abandoned'] += 1
+        flight.task.get_loop().call_soon_threadsafe(flight.task.cancel)
+
+    def _land(self, key, flight, task):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if task.cancelled():
+            flight.future.cancel()
+        elif task.exception() is not None:
+            flight.future.set_exception(task.exception())
+        else:
+            flight.future.set_result(task.result())
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, 'in_flight': len(self._flights)}
+
+
+def coalesced(flights, kind):
+    """Decorates a request handler so identical concurrent requests share one run.
+
+    Requests that explicitly bypass or refresh the cache always run on their own.
+    """
+    def decorate(handler):
+        @functools.wraps(handler)
+        async def wrapper(data):
+            if not isinstance(data, dict) or data.get('cache', 'use') != 'use':
+                return await handler(data)
+            return await flights.do(request_fingerprint(kind, data), lambda: handler(data))
+        return wrapper
+    return decorate
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        if self.capacity <= 0:
+            return 0.0
+        # A call larger than the whole budget waits for a full bucket rather than forever.
+        deficit = min(amount, self.capacity) - self.level
+        return deficit / self.rate if deficit > 0 else 0.0
+
+    def take(self, amount):
+        if self.capacity > 0:
+            self.level -= amount
+
+
+class ModelScheduler:
+    """Requests-per-minute and tokens-per-minute budgets for all model calls, served by priority.
+
+    A call waits while a call of a higher priority class is waiting, so
+    interactive requests overtake batch and background work at peak. Token
+    budgets are drawn with an estimate and settled with the real usage.
+    """
+
+    def __init__(self, rpm=MODEL_RPM_LIMIT, tpm=MODEL_TPM_LIMIT, max_retries=MODEL_MAX_RETRIES):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._waiting = [0] * len(PRIORITIES)
+        self._paused_until = 0.0
+        self.stats = {'calls': 0, 'waited': 0, 'wait_seconds': 0.0, 'upstream_errors': 0, 'rate_limited': 0,
+                      'deadline_rejected': 0}
+
+    async def acquire(self, tokens, priority='interactive'):
+        """Waits until the call fits the budgets; returns the seconds waited."""
+        rank = PRIORITIES.index(priority) if priority in PRIORITIES else 0
+        started = time.monotonic()
+        with self._lock:
+            self._waiting[rank] += 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+                    if any(self._waiting[:rank]):
+                        wait = 0.05
+                    elif now < self._paused_until:
+                        wait = self._paused_until - now
+                    else:
+                        wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                        if wait <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            waited = now - started
+                            self.stats['calls'] += 1
+                            if waited > 0.001:
+                                self.stats['waited'] += 1
+                                self.stats['wait_seconds'] += waited
+                            break
+                    if not time_for(wait):
+                        self.stats['deadline_rejected'] += 1
+                        raise DeadlineExceeded("The model budget does not free up before the request deadline")
+                await asyncio.sleep(min(max(wait, 0.01), 1.0))
+        finally:
+            with self._lock:
+                self._waiting[rank] -= 1
+        metrics.observe('interview_scheduler_wait_seconds', waited, priority=priority)
+        return waited
+
+    def settle(self, estimated, actual):
+        """Corrects the token budget once the real usage of a call is known."""
+        with self._lock:
+            self.tokens.take(actual - estimated)
+
+    def failed(self, estimated, error):
+        """Returns a failed call's tokens and, after a rate limit, holds every call back for a while."""
+        from openai import RateLimitError
+
+        with self._lock:
+            self.tokens.take(-estimated)
+            self.stats['upstream_errors'] += 1
+            if isinstance(error, RateLimitError):
+                self.stats['rate_limited'] += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + (retry_after_seconds(error) or 1.0))
+
+    def idle(self, headroom=0.5):
+        """True when no foreground call is waiting and both budgets have at least ``headroom`` of their capacity free."""
+        with self._lock:
+            now = time.monotonic()
+            if any(self._waiting[:PRIORITIES.index('background')]) or now < self._paused_until:
+                return False
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return all(bucket.capacity <= 0 or bucket.level >= headroom * bucket.capacity
+                       for bucket in (self.requests, self.tokens))
+
+    def snapshot(self):
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return {
+                **self.stats,
+                'wait_seconds': round(self.stats['wait_seconds'], 3),
+                'waiting': dict(zip(PRIORITIES, self._waiting)),
+                'rpm_limit': self.requests.capacity,
+                'tpm_limit': self.tokens.capacity,
+                'requests_available': int(self.requests.level),
+                'tokens_available': int(self.tokens.level),
+            }
+
+
+def estimate_tokens(system_instructions, input, model_settings):
+    prompt = len(system_instructions or '') + len(input if isinstance(input, str) else json.dumps(input, default=str))
+    return prompt // 4 + (getattr(model_settings, 'max_tokens', None) or MODEL_OUTPUT_TOKEN_ESTIMATE)
+
+
+def usage_tokens(usage):
+    return (usage.input_tokens or 0) + (usage.output_tokens or 0) if usage else 0
@@ -0,0 +1,45 @@
+"""Typed output schemas for the agents' structured output mode.
+
+The SDK sends these as strict JSON schemas, which do not allow default
+values, so every field is required.
+"""
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class Question(BaseModel):
+    question: str
+    options: list[str]
+    correct_options: list[str] = Field(description="The exact text of every correct option.")
+    difficulty: Literal['foundational', 'intermediate', 'advanced']
+    tags: list[str] = Field(description="One to three short names of the skills the question assesses.")
+
+
+class QuestionSet(BaseModel):
+    questions: list[Question]
+
+
+class Evaluation(BaseModel):
+    strengths: str
+    correct_answers: list[str] = Field(description="The text of each question the candidate answered correctly.")
+    incorrect_answers: list[str] = Field(description="The text of each question the candidate answered incorrectly.")
+    correct_question_ids: list[str] = Field(description="The id of each question the candidate answered correctly.")
+    incorrect_question_ids: list[str] = Field(description="The id of each question the candidate answered incorrectly.")
+    technical_knowledge: str
+    areas_of_improvement: str
+    performance_rank: int = Field(description="Rank from 1 (worst) to 5 (best).")
+
+
+class EvaluationReport(BaseModel):
+    evaluation: Evaluation
+
+
+class Narrative(BaseModel):
+    strengths: str
+    technical_knowledge: str
+    areas_of_improvement: str
+
+
+class NarrativeReport(BaseModel):
+    evaluation: Narrative
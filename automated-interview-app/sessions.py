@@ -0,0 +1,103 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+ADAPTIVE_SESSION_DB_PATH = os.getenv('ADAPTIVE_SESSION_DB_PATH', 'adaptive_sessions.sqlite3')
+ADAPTIVE_SESSION_TTL_SECONDS = int(os.getenv('ADAPTIVE_SESSION_TTL_SECONDS', str(7 * 24 * 3600)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at);
+"""
+
+
+class SessionStore:
+    """SQLite store of adaptive test sessions; survives restarts and can be shared by several processes.
+
+    Sessions are only dropped once untouched for ``ttl_seconds``, never to
+    make room, and the sweep runs at most once per ``sweep_interval``
+    seconds rather than on every answer. Every ``get`` returns a fresh copy,
+    so a caller updating a session changes nothing until it puts it back;
+    ``update`` reads and writes one back within a single transaction.
+    """
+
+    def __init__(self, path=ADAPTIVE_SESSION_DB_PATH, ttl_seconds=ADAPTIVE_SESSION_TTL_SECONDS, sweep_interval=3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'expired': 0}
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def _read(self, db, session_id):
+        row = db.execute('SELECT data, updated_at FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        if row is None or (self.ttl_seconds > 0 and time.time() - row['updated_at'] > self.ttl_seconds):
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return json.loads(row['data'])
+
+    def get(self, session_id):
+        """Returns the session or None when it is unknown or expired."""
+        return self._read(self._connect(), session_id)
+
+    def update(self, session_id, change):
+        """Runs ``change`` on the session within one write transaction and returns its result.
+
+        ``change`` gets the session, or None when it is unknown or expired, and
+        returns ``(result, changed)``; the session is only written back when
+        ``changed`` is true. Concurrent updates of a session thus apply one after another.
+        """
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            session = self._read(db, session_id)
+            result, changed = change(session)
+            if changed:
+                db.execute('UPDATE sessions SET data = ?, updated_at = ? WHERE id = ?',
+                           (json.dumps(session, ensure_ascii=False), time.time(), session_id))
+                self.stats['stores'] += 1
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return result
+
+    def put(self, session_id, session):
+        now = time.time()
+        self._connect().execute(
+            'INSERT INTO sessions (id, data, updated_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at',
+            (session_id, json.dumps(session, ensure_ascii=False), now))
+        self.stats['stores'] += 1
+        if now - self._last_sweep > self.sweep_interval:
+            self._last_sweep = now
+            self.sweep(now)
+
+    def sweep(self, now=None):
+        """Deletes the sessions untouched for longer than the TTL."""
+        if self.ttl_seconds <= 0:
+            return
+        cursor = self._connect().execute('DELETE FROM sessions WHERE updated_at < ?',
+                                         ((now or time.time()) - self.ttl_seconds,))
+        self.stats['expired'] += cursor.rowcount
+
+    def snapshot(self):
+        count = self._connect().execute('SELECT COUNT(*) AS count FROM sessions').fetchone()['count']
+        return {**self.stats, 'sessions': count}
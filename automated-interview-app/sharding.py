@@ -0,0 +1,69 @@
+import math
+import re
+
+DIFFICULTY_BANDS = ["foundational", "intermediate", "advanced"]
+
+
+def plan_shards(question_count, shards, topics=None):
+    """Splits a request into (count, focus) sub-requests.
+
+    Shards are cut by the given topics when there are any, otherwise by
+    difficulty band. Each shard asks for a few extra questions so the merged
+    set still reaches ``question_count`` after de-duplication.
+    """
+    shards = max(1, min(shards, question_count))
+    focuses = [f"the topic '{topic}'" for topic in topics] if topics else \
+        [f"{band} difficulty questions" for band in DIFFICULTY_BANDS]
+    base, remainder = divmod(question_count, shards)
+    plan = []
+    for index in range(shards):
+        count = base + (1 if index < remainder else 0)
+        focus = focuses[index % len(focuses)]
+        if shards > len(focuses):
+            focus = f"{focus} (part {index // len(focuses) + 1})"
+        plan.append((count + max(1, count // 10), focus))
+    return plan
+
+
+def question_fingerprint(question):
+    """Normalizes question text so trivially reworded duplicates compare equal."""
+    text = question.get("question", "") if isinstance(question, dict) else str(question)
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def merge_question_sets(question_sets, question_count):
+    """Interleaves the shard results, drops duplicates and trims to the requested count.
+
+    Interleaving keeps the trimmed set balanced across shards.
+    """
+    seen = set()
+    merged = []
+    lists = [data.get("questions", []) for data in question_sets if isinstance(data, dict)]
+    for row in range(max((len(questions) for questions in lists), default=0)):
+        for questions in lists:
+            if row >= len(questions):
+                continue
+            fingerprint = question_fingerprint(questions[row])
+            if not fingerprint or fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            merged.append(questions[row])
+    return {"questions": merged[:question_count]}
+
+
+def chunk_questions(questions, chunk_size):
+    """Splits a sheet into the fewest groups of at most ``chunk_size`` questions, evenly sized."""
+    if not questions:
+        return []
+    chunks = math.ceil(len(questions) / max(1, chunk_size))
+    base, remainder = divmod(len(questions), chunks)
+    groups, start = [], 0
+    for index in range(chunks):
+        end = start + base + (1 if index < remainder else 0)
+        groups.append(questions[start:end])
+        start = end
+    return groups
+
+
+def default_shard_count(question_count, per_shard=10):
+    return max(1, math.ceil(question_count / per_shard))
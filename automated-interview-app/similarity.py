@@ -0,0 +1,170 @@
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+NUM_PERMUTATIONS = 128
+SHINGLE_SIZE = 5
+SIMILARITY_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', '0.5'))
+QUERY_CHUNK_ROWS = 4096
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, int(_MERSENNE_PRIME), size=NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, int(_MERSENNE_PRIME), size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def question_text(question):
+    """Text used to compare questions: the question plus its options in a stable order."""
+    if not isinstance(question, dict):
+        return str(question)
+    options = sorted(str(option) for option in question.get('options', []))
+    return ' '.join([str(question.get('question', ''))] + options)
+
+
+def shingles(text):
+    text = ' '.join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signatures(texts):
+    """Returns an (n, NUM_PERMUTATIONS) uint32 MinHash signature matrix."""
+    signatures = np.empty((len(texts), NUM_PERMUTATIONS), dtype=np.uint32)
+    for row, text in enumerate(texts):
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles(text)), dtype=np.uint64)
+        permuted = (hashes[None, :] * _A[:, None] + _B[:, None]) % _MERSENNE_PRIME
+        signatures[row] = permuted.min(axis=1)
+    return signatures
+
+
+def similarity_matrix(left, right):
+    """Estimated Jaccard similarity of every left signature to every right signature."""
+    return (left[:, None, :] == right[None, :, :]).mean(axis=2, dtype=np.float32)
+
+
+def duplicates_within(signatures, threshold=SIMILARITY_THRESHOLD):
+    """Indexes of rows that near-duplicate an earlier row of the same matrix."""
+    if len(signatures) < 2:
+        return set()
+    similar = np.triu(similarity_matrix(signatures, signatures) >= threshold, k=1)
+    return {int(j) for j in np.nonzero(similar.any(axis=0))[0]}
+
+
+class SimilarityIndex:
+    """In-memory bank of MinHash signatures of previously generated questions.
+
+    Queries compare a whole new set against the bank in chunked, vectorized
+    comparisons. The bank is persisted to an ``.npz`` file at most every
+    ``save_interval`` seconds.
+    """
+
+    def __init__(self, path=None, save_interval=60):
+        self.path = path
+        self.save_interval = save_interval
+        self.signatures = np.empty((0, NUM_PERMUTATIONS), dtype=np.uint32)
+        self.ids = []
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = 0.0
+        if path and os.path.exists(path):
+            with np.load(path, allow_pickle=False) as stored:
+                self.signatures = stored['signatures']
+                self.ids = [str(i) for i in stored['ids']]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, ids, signatures):
+        with self._lock:
+            known = set(self.ids)
+            fresh = [row for row, qid in enumerate(ids) if qid not in known]
+            if not fresh:
+                return
+            self.signatures = np.vstack([self.signatures, signatures[fresh]])
+            self.ids.extend(ids[row] for row in fresh)
+            self._dirty = True
+        self.save(force=False)
+
+    def best_matches(self, signatures):
+        """For each row, returns (best similarity, matching id) against the bank."""
+        with self._lock:
+            bank, ids = self.signatures, list(self.ids)
+        best = np.zeros(len(signatures), dtype=np.float32)
+        best_index = np.full(len(signatures), -1)
+        for start in range(0, len(bank), QUERY_CHUNK_ROWS):
+            scores = similarity_matrix(signatures, bank[start:start + QUERY_CHUNK_ROWS])
+            chunk_best = scores.argmax(axis=1)
+            chunk_scores = scores[np.arange(len(signatures)), chunk_best]
+            improved = chunk_scores > best
+            best[improved] = chunk_scores[improved]
+            best_index[improved] = chunk_best[improved] + start
+        return [(float(score), ids[index] if index >= 0 else None) for score, index in zip(best, best_index)]
+
+    def save(self, force=True):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty or (not force and time.monotonic() - self._saved_at < self.save_interval):
+                return
+            signatures, ids = self.signatures, list(self.ids)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, signatures=signatures, ids=np.array(ids, dtype=str))
+        os.replace(tmp_path, self.path)
+
+
+class NearDuplicateFilter:
+    """Keeps the questions of one set that are not near-duplicates.
+
+    ``accept`` can be called with the whole set at once or incrementally as
+    questions stream in; each question is compared against the questions
+    already kept and, when an index is given, against the bank.
+    """
+
+    def __init__(self, index=None, threshold=SIMILARITY_THRESHOLD):
+        self.index = index
+        self.threshold = threshold
+        self.signatures = np.empty((0, NUM_PERMUTATIONS), dtype=np.uint32)
+        self.ids = []
+        self.dropped = []
+
+    def accept(self, questions, ids):
+        """Returns the questions that are kept."""
+        if not questions:
+            return []
+        signatures = minhash_signatures([question_text(q) for q in questions])
+        reasons = {row: ('set', None, None) for row in duplicates_within(signatures, self.threshold)}
+        if len(self.signatures):
+            scores = similarity_matrix(signatures, self.signatures)
+            for row in np.nonzero(scores.max(axis=1) >= self.threshold)[0]:
+                reasons.setdefault(int(row), ('set', self.ids[int(scores[row].argmax())], float(scores[row].max())))
+        if self.index is not None and len(self.index):
+            for row, (score, match) in enumerate(self.index.best_matches(signatures)):
+                if score >= self.threshold:
+                    reasons.setdefault(row, ('bank', match, score))
+
+        kept = [row for row in range(len(questions)) if row not in reasons]
+        self.signatures = np.vstack([self.signatures, signatures[kept]])
+        self.ids.extend(ids[row] for row in kept)
+        for row, (source, match, score) in sorted(reasons.items()):
+            question = questions[row]
+            self.dropped.append({
+                'question': question.get('question') if isinstance(question, dict) else question,
+                'duplicate_of': source,
+                'matched_id': match,
+                'similarity': round(score, 3) if score is not None else None,
+            })
+        return [questions[row] for row in kept]
+
+    def register(self, index, ids=None):
+        """Adds the kept questions (or the given subset of them) to the bank."""
+        wanted = set(self.ids if ids is None else ids)
+        rows = [row for row, qid in enumerate(self.ids) if qid in wanted]
+        if rows:
+            index.add([self.ids[row] for row in rows], self.signatures[rows])
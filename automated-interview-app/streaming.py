@@ -0,0 +1,78 @@
+import json
+
+
+class IncrementalQuestionParser:
+    """Pulls complete question objects out of a partially received questions json.
+
+    The model streams ``{"questions": [{...}, {...}, ...]}`` as text deltas; every
+    object that closes directly inside the top level ``questions`` array is
+    returned by ``feed`` as soon as its closing brace arrives.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.questions = []
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._start = None
+
+    def feed(self, chunk):
+        """Consumes a text delta and returns the questions it completed."""
+        self.text += chunk
+        completed = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"' and self._stack:
+                self._in_string = True
+            elif char in "{[":
+                if char == "{" and self._stack == ["{", "["]:
+                    self._start = i
+                self._stack.append(char)
+            elif char in "}]" and self._stack:
+                self._stack.pop()
+                if char == "}" and self._start is not None and self._stack == ["{", "["]:
+                    question = self._parse(text[self._start:i + 1])
+                    self._start = None
+                    if question is not None:
+                        self.questions.append(question)
+                        completed.append(question)
+        self._pos = len(text)
+        return completed
+
+    @staticmethod
+    def _parse(fragment):
+        try:
+            question = json.loads(fragment)
+        except ValueError:
+            return None
+        return question if isinstance(question, dict) and "question" in question else None
+
+    def result(self):
+        """Parses the whole streamed text, falling back to the questions seen so far."""
+        text = self.text.strip()
+        start, end = text.find("{"), text.rfind("}")
+        if start != -1 and end > start:
+            try:
+                data = json.loads(text[start:end + 1])
+                if isinstance(data, dict) and isinstance(data.get("questions"), list):
+                    return data
+            except ValueError:
+                pass
+        return {"questions": list(self.questions)} if self.questions else None
+
+
+def sse_event(event, data):
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
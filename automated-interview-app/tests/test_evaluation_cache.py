@@ -0,0 +1,54 @@
+from evaluation_cache import changed_questions, extract_verdicts, merge_report
+from grading import question_id
+
+
+def make_question(text, answer='a'):
+    return {'question': text, 'options': ['a', 'b', 'c', 'd', 'e'], 'answer': answer}
+
+
+def report(correct=(), incorrect=(), correct_ids=None, incorrect_ids=None):
+    evaluation = {'correct_answers': list(correct), 'incorrect_answers': list(incorrect)}
+    if correct_ids is not None:
+        evaluation.update(correct_question_ids=correct_ids, incorrect_question_ids=incorrect_ids or [])
+    return {'evaluation': evaluation}
+
+
+def test_question_with_quotes_and_backslashes_gets_a_verdict():
+    quoted = make_question('What does "C:\\temp" refer to?')
+    plain = make_question('What is a mutex?')
+    verdicts = extract_verdicts(report([quoted['question']], [plain['question']]), [quoted, plain])
+    assert verdicts == {question_id(quoted): True, question_id(plain): False}
+
+
+def test_question_text_that_prefixes_another_keeps_its_own_verdict():
+    short = make_question('What is caching')
+    long = make_question('What is caching in a CDN')
+    verdicts = extract_verdicts(report([short['question']], [long['question']]), [short, long])
+    assert verdicts == {question_id(short): True, question_id(long): False}
+
+
+def test_question_ids_take_precedence_over_text():
+    first, second = make_question('Same text', 'a'), make_question('Same text', 'b')
+    second['options'] = ['v', 'w', 'x', 'y', 'z']
+    listed = report(['Same text'], [], [question_id(first)], [question_id(second)])
+    assert extract_verdicts(listed, [first, second]) == {question_id(first): True, question_id(second): False}
+
+
+def test_question_listed_as_both_or_neither_gets_no_verdict():
+    both, neither = make_question('Listed twice'), make_question('Not listed')
+    assert extract_verdicts(report(['Listed twice'], ['Listed twice']), [both, neither]) == {}
+
+
+def test_resubmission_with_a_quoted_question_only_rejudges_the_changed_answer():
+    questions = [make_question(f'Question "{index}"') for index in range(4)]
+    verdicts = extract_verdicts(report([q['question'] for q in questions]), questions)
+    previous = {'answers': {question_id(q): ['a'] for q in questions}, 'verdicts': verdicts}
+    questions[0] = {**questions[0], 'answer': 'b'}
+    assert changed_questions(questions, previous) == [questions[0]]
+
+
+def test_merged_report_lists_question_ids():
+    right, wrong = make_question('Right'), make_question('Wrong')
+    evaluation = merge_report(None, [right, wrong], {question_id(right): True, question_id(wrong): False})['evaluation']
+    assert evaluation['correct_question_ids'] == [question_id(right)]
+    assert evaluation['incorrect_question_ids'] == [question_id(wrong)]
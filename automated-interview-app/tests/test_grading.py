@@ -0,0 +1,50 @@
+from grading import drop_mismatched_keys, grade, has_answer_key
+
+
+def keyed_question(text, correct, options=('Alpha', 'Beta', 'Gamma', 'Delta', 'Epsilon')):
+    return {'question': text, 'options': list(options), 'correct_options': list(correct)}
+
+
+def sheet(*answers):
+    return {'questions': [{'question': question['question'], 'options': question['options'], 'answer': answer}
+                          for question, answer in answers]}
+
+
+KEY = {'questions': [keyed_question('Pick one', ['Beta']), keyed_question('Pick two', ['Alpha', 'Gamma'])]}
+
+
+def test_multi_correct_question_needs_exactly_the_correct_options():
+    one, two = KEY['questions']
+    assert grade(sheet((one, 'Beta'), (two, ['gamma ', 'ALPHA'])), KEY)['score']['correct'] == 2
+    partial = grade(sheet((one, 'Beta'), (two, ['Alpha'])), KEY)
+    assert partial['score'] == {'correct': 1, 'total': 2, 'percentage': 50.0}
+    too_many = grade(sheet((one, 'Beta'), (two, ['Alpha', 'Gamma', 'Delta'])), KEY)
+    assert too_many['score']['correct'] == 1
+
+
+def test_unanswered_question_counts_as_incorrect():
+    one, two = KEY['questions']
+    grading = grade(sheet((one, None), (two, [])), KEY)
+    assert grading['unanswered'] == 2
+    assert grading['score']['correct'] == 0
+    assert [item['correct_options'] for item in grading['incorrect_answers']] == [['Beta'], ['Alpha', 'Gamma']]
+
+
+def test_sheet_of_another_question_set_is_not_graded():
+    foreign = keyed_question('Not in this set', ['Alpha'])
+    assert grade(sheet((foreign, 'Alpha')), KEY) is None
+
+
+def test_key_naming_an_option_the_question_lacks_is_not_an_answer_key():
+    paraphrased = keyed_question('Pick one', ['The second option'])
+    assert has_answer_key(KEY)
+    assert not has_answer_key({'questions': [KEY['questions'][0], paraphrased]})
+    assert not has_answer_key({'questions': [keyed_question('No key', [])]})
+
+
+def test_mismatched_keys_are_dropped_and_the_rest_kept():
+    paraphrased = keyed_question('Pick one', ['The second option'])
+    checked, dropped = drop_mismatched_keys([KEY['questions'][1], paraphrased])
+    assert dropped == 1
+    assert checked[0] == KEY['questions'][1]
+    assert 'correct_options' not in checked[1]
@@ -0,0 +1,56 @@
+import threading
+
+USAGE_FIELDS = ('requests', 'input_tokens', 'cached_input_tokens', 'output_tokens', 'total_tokens')
+
+
+def usage_to_dict(usage):
+    """Flattens the SDK's Usage object of a run."""
+    details = getattr(usage, 'input_tokens_details', None)
+    return {
+        'requests': usage.requests or 0,
+        'input_tokens': usage.input_tokens or 0,
+        'cached_input_tokens': (getattr(details, 'cached_tokens', 0) or 0) if details is not None else 0,
+        'output_tokens': usage.output_tokens or 0,
+        'total_tokens': usage.total_tokens or 0,
+    }
+
+
+def add_usage(total, usage):
+    """Adds one usage dict into another, returning the sum."""
+    total = dict(total or {})
+    for field in USAGE_FIELDS:
+        total[field] = total.get(field, 0) + (usage or {}).get(field, 0)
+    return total
+
+
+class TokenUsageStats:
+    """Per-agent token and time-to-first-token totals across requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents = {}
+
+    def record(self, agent_name, usage, time_to_first_token=None):
+        with self._lock:
+            stats = self._agents.setdefault(agent_name, {'runs': 0, 'ttft_runs': 0, 'ttft_seconds': 0.0})
+            stats['runs'] += 1
+            for field in USAGE_FIELDS:
+                stats[field] = stats.get(field, 0) + usage.get(field, 0)
+            if time_to_first_token is not None:
+                stats['ttft_runs'] += 1
+                stats['ttft_seconds'] += time_to_first_token
+
+    def snapshot(self):
+        with self._lock:
+            agents = {name: dict(stats) for name, stats in self._agents.items()}
+        for stats in agents.values():
+            runs = stats['runs'] or 1
+            stats['avg_input_tokens'] = round(stats.get('input_tokens', 0) / runs, 1)
+            stats['avg_output_tokens'] = round(stats.get('output_tokens', 0) / runs, 1)
+            input_tokens = stats.get('input_tokens', 0)
+            stats['cached_input_ratio'] = round(stats.get('cached_input_tokens', 0) / input_tokens, 4) if input_tokens else 0.0
+            ttft_runs = stats.pop('ttft_runs')
+            ttft_seconds = stats.pop('ttft_seconds')
+            stats['avg_time_to_first_token_seconds'] = round(ttft_seconds / ttft_runs, 3) if ttft_runs else None
+        return agents
+
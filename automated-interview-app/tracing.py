@@ -0,0 +1,221 @@
+"""Sampled agent traces, named by stage and written locally in batches.
+
+Every agent run opens a trace named after its stage, such as question
+generation, one shard of it, or one chunk of an evaluation. The share of
+requests that is traced is ``TRACE_SAMPLE_RATE``, with per endpoint overrides
+in ``TRACE_SAMPLE_RATES``. The decision is taken from the request id, so the
+shards and chunks of one request are traced together and grouped under that
+id. A run that is not sampled gets the SDK's no-op trace and records nothing.
+
+``TRACE_EXPORTER`` picks where sampled traces go:
+
+* ``local`` (default) buffers finished traces and spans in ``JsonlTraceSink``,
+  whose daemon thread appends them to the ``TRACE_LOG_PATH`` JSON-lines file
+  in batches, so neither the request nor the network is on the export path.
+* ``openai`` keeps the SDK's exporter to the OpenAI traces dashboard.
+* ``both`` does both, and ``off`` switches tracing off.
+
+Offline backends never export to OpenAI: ``openai`` becomes ``off`` and
+``both`` becomes ``local`` for them.
+"""
+from collections import deque
+import hashlib
+import json
+import os
+import random
+import threading
+
+from metrics import current_endpoint
+
+TRACE_EXPORTERS = ('local', 'openai', 'both', 'off')
+
+
+def parse_sample_rates(value):
+    """Parses ``"/evaluate=1,/generate-questions=0.05"`` into ``{endpoint: rate}``."""
+    rates = {}
+    for item in value.split(','):
+        endpoint, _, rate = item.partition('=')
+        if endpoint.strip() and rate.strip():
+            rates[endpoint.strip()] = float(rate)
+    return rates
+
+
+TRACE_EXPORTER = os.getenv('TRACE_EXPORTER', 'local')
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0.1'))
+# Per endpoint overrides of the sample rate, e.g. "/evaluate=1,/generate-questions/stream=0.05".
+TRACE_SAMPLE_RATES = parse_sample_rates(os.getenv('TRACE_SAMPLE_RATES', ''))
+TRACE_LOG_PATH = os.getenv('TRACE_LOG_PATH', '.traces/traces.jsonl')
+# Once the log reaches this size it is moved to "<path>.1", replacing the previous one.
+TRACE_LOG_MAX_BYTES = int(os.getenv('TRACE_LOG_MAX_BYTES', str(100 * 1024 * 1024)))
+TRACE_BATCH_SIZE = int(os.getenv('TRACE_BATCH_SIZE', '256'))
+TRACE_FLUSH_INTERVAL_SECONDS = float(os.getenv('TRACE_FLUSH_INTERVAL_SECONDS', '5'))
+# Traces and spans arriving while this many wait to be written are dropped.
+TRACE_MAX_BUFFER = int(os.getenv('TRACE_MAX_BUFFER', '10000'))
+# Prompts and model output stay out of the spans unless asked for.
+TRACE_INCLUDE_SENSITIVE_DATA = os.getenv('TRACE_INCLUDE_SENSITIVE_DATA', 'false').lower() in ('1', 'true', 'yes')
+
+
+def sample_rate(endpoint):
+    return TRACE_SAMPLE_RATES.get(endpoint, TRACE_SAMPLE_RATE)
+
+
+def sampled(endpoint, key=None):
+    """Whether a request to ``endpoint`` is traced; the same ``key`` always gets the same answer."""
+    rate = sample_rate(endpoint)
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    if key is None:
+        return random.random() < rate
+    point = int.from_bytes(hashlib.blake2b(str(key).encode('utf-8'), digest_size=8).digest(), 'big') / 2 ** 64
+    return point < rate
+
+
+def agent_trace(stage, request_id=None, **metadata):
+    """Opens the trace of one agent run, named after its stage; a no-op trace when the request is not sampled.
+
+    Metadata given as None is left out.
+    """
+    from agents import trace
+
+    endpoint = current_endpoint.get()
+    return trace(stage, group_id=request_id, disabled=not sampled(endpoint, request_id),
+                 metadata={'endpoint': endpoint,
+                           **{key: str(value) for key, value in metadata.items() if value is not None}})
+
+
+class JsonlTraceSink:
+    """Buffers finished traces and spans and appends them to a JSON-lines file in batches.
+
+    Implements the agents SDK's ``TracingProcessor`` interface. Its callbacks
+    run on the request path and only append the finished trace or span to a
+    bounded buffer. A daemon thread exports and writes them every
+    ``interval`` seconds, or as soon as a batch is full.
+    """
+
+    def __init__(self, path=TRACE_LOG_PATH, batch_size=TRACE_BATCH_SIZE, interval=TRACE_FLUSH_INTERVAL_SECONDS,
+                 max_buffer=TRACE_MAX_BUFFER, max_bytes=TRACE_LOG_MAX_BYTES):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self.max_bytes = max_bytes
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self.stats = {'traces': 0, 'spans': 0, 'written': 0, 'batches': 0, 'dropped': 0, 'failed': 0}
+
+    def _push(self, item, kind):
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self.stats['dropped'] += 1
+                return
+            self._buffer.append(item)
+            self.stats[kind] += 1
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def on_trace_start(self, trace):
+        pass
+
+    def on_trace_end(self, trace):
+        self._push(trace, 'traces')
+
+    def on_span_start(self, span):
+        pass
+
+    def on_span_end(self, span):
+        self._push(span, 'spans')
+
+    def flush(self):
+        """Writes everything buffered so far, a batch at a time."""
+        with self._write_lock:
+            while True:
+                with self._lock:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    return
+                lines = [json.dumps(exported, ensure_ascii=False, default=str)
+                         for exported in (item.export() for item in batch) if exported]
+                try:
+                    self._write(lines)
+                except OSError as e:
+                    self.stats['failed'] += len(lines)
+                    print(f"An error occurred while writing traces: {e}")
+                    return
+
+    def _write(self, lines):
+        if not lines:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            os.replace(self.path, self.path + '.1')
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        self.stats['written'] += len(lines)
+        self.stats['batches'] += 1
+
+    def force_flush(self):
+        self.flush()
+
+    def shutdown(self):
+        self._stopped.set()
+        self._wakeup.set()
+        self.flush()
+
+    def ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name='trace-sink', daemon=True)
+                self._thread.start()
+
+    def _work(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            buffered = len(self._buffer)
+        return {**self.stats, 'buffered': buffered, 'exporter': active_exporter, 'path': self.path,
+                'sample_rate': TRACE_SAMPLE_RATE, 'sample_rates': TRACE_SAMPLE_RATES}
+
+
+# One sink per worker process, shared by every agent run.
+trace_sink = JsonlTraceSink()
+
+# The exporter in effect once configure_tracing has run.
+active_exporter = None
+
+
+def configure_tracing(offline=False):
+    """Installs the trace processors for ``TRACE_EXPORTER``; ``offline`` backends never export to OpenAI."""
+    global active_exporter
+    from agents import add_trace_processor, set_trace_processors, set_tracing_disabled
+    from agents.tracing import TracingProcessor
+
+    if TRACE_EXPORTER not in TRACE_EXPORTERS:
+        raise ValueError(f"TRACE_EXPORTER must be one of {', '.join(TRACE_EXPORTERS)}")
+    exporter = TRACE_EXPORTER
+    if offline:
+        exporter = {'openai': 'off', 'both': 'local'}.get(exporter, exporter)
+    TracingProcessor.register(JsonlTraceSink)
+    if exporter == 'off':
+        set_tracing_disabled(True)
+    elif exporter == 'local':
+        set_trace_processors([trace_sink])
+    elif exporter == 'both':
+        add_trace_processor(trace_sink)
+    if exporter in ('local', 'both'):
+        trace_sink.ensure_started()
+    active_exporter = exporter
@@ -0,0 +1,121 @@
+"""Compact, ID-based wire format for answer sheets, and the fast json path.
+
+Published questions carry a content-addressed ``id`` and positional
+``option_ids``, so a candidate submits only
+``{"question_set_id": ..., "answers": {"<question id>": ["b"]}}`` instead of
+echoing every question and option text back. The server rehydrates the text
+from the stored question set, and the evaluator sees the options keyed by id
+with the answers as ids, so no option text is repeated in its prompt.
+
+``dumps`` and ``loads`` use orjson when it is installed.
+"""
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+from grading import normalize_option, option_ids, question_id
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data):
+    """Parses json text or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value):
+    """Serializes to compact UTF-8 json bytes."""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask json provider that parses request bodies and renders responses with orjson."""
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def parse_interview_json(value, field='interview_json'):
+    """Accepts a sheet or question set as a native json object or, as before, as a json string inside the body.
+
+    Raises ``ValueError`` unless it is an object whose ``questions`` is a list
+    of objects, each with its ``options``, if any, as a list.
+    """
+    if isinstance(value, (str, bytes)):
+        value = loads(value)
+    if not isinstance(value, dict):
+        raise ValueError(f"{field} must be a json object")
+    questions = value.get('questions')
+    if not isinstance(questions, list) or not all(isinstance(question, dict) for question in questions):
+        raise ValueError(f"{field} must have a list of question objects")
+    if not all(isinstance(question.get('options', []), list) for question in questions):
+        raise ValueError(f"The options of every question in {field} must be a list")
+    return value
+
+
+def rehydrate_answers(question_set, answers, set_id=None):
+    """Builds the text answer sheet from compact answers ``{question id: [option ids]}``.
+
+    Questions without an answer are left unanswered. Raises ``ValueError``
+    for ids that do not belong to the question set.
+    """
+    if not isinstance(answers, dict):
+        raise ValueError("answers must map question ids to lists of option ids")
+    questions = {question_id(q): q for q in question_set.get('questions', [])}
+    unknown = [qid for qid in answers if qid not in questions]
+    if unknown:
+        raise ValueError(f"Unknown question id '{unknown[0]}'")
+    sheet = []
+    for qid, question in questions.items():
+        chosen = answers.get(qid)
+        if isinstance(chosen, str):
+            chosen = [chosen]
+        if chosen is not None and not isinstance(chosen, list):
+            raise ValueError(f"The answer to question '{qid}' must be a list of option ids")
+        options = dict(zip(option_ids(question), question.get('options', [])))
+        invalid = [option for option in chosen or [] if option not in options]
+        if invalid:
+            raise ValueError(f"Unknown option id '{invalid[0]}' for question '{qid}'")
+        sheet.append({'question': question.get('question'), 'options': question.get('options', []),
+                      'answer': [options[option] for option in chosen] if chosen else None})
+    body = {'questions': sheet}
+    if set_id is not None:
+        body['question_set_id'] = set_id
+    return body
+
+
+def answer_ids(question, answer):
+    """Maps a text answer to option ids; text that matches no option is kept as it is."""
+    if answer is None:
+        return []
+    by_text = {normalize_option(option): oid for oid, option in zip(option_ids(question), question.get('options', []))}
+    return [by_text.get(normalize_option(a), a) for a in (answer if isinstance(answer, list) else [answer])
+            if str(a).strip()]
+
+
+def compact_sheet(questions):
+    """The sheet as the evaluator sees it: questions and options keyed by id and answers given as option ids."""
+    sheet = []
+    for question in questions:
+        entry = {'id': question_id(question), 'question': question.get('question'),
+                 'options': dict(zip(option_ids(question), question.get('options', [])))}
+        if 'answer' in question:
+            entry['answer'] = answer_ids(question, question['answer'])
+        sheet.append(entry)
+    return {'questions': sheet}